@@ -0,0 +1,169 @@
+import os
+from copy import copy
+
+import yaml
+
+from ultralytics.data import YOLODataset
+from ultralytics.models.yolo.detect import DetectionTrainer, DetectionValidator
+from ultralytics.utils import colorstr
+
+from DatasetCache import open_cache
+
+
+class CachedYOLODataset(YOLODataset):
+    """
+    YOLODataset reading images and labels from a DatasetCache split instead
+    of decoding JPEGs and scanning label files. Augmentations still run per
+    sample, only the decode and resize are gone.
+    """
+
+    def __init__(self, split, *args, files=None, **kwargs):
+        self.split = split
+        # rect mode reorders im_files, so rows are looked up by file. With
+        # files given (an image list, see LabelManifest) only those are used.
+        self.rows_ = {
+            split.path(row): row
+            for row in range(len(split))
+            if split.valid[row] and (files is None or split.path(row) in files)
+        }
+        super().__init__(*args, **kwargs)
+
+    def get_img_files(self, img_path):
+        files = list(self.rows_)
+        if isinstance(self.fraction, int):
+            count = self.fraction
+        else:
+            count = max(1, round(len(files) * self.fraction))
+        return files[:count]
+
+    def get_labels(self):
+        labels = []
+        for im_file in self.im_files:
+            row = self.rows_[im_file]
+            lb = self.split.labels_of(row)
+            labels.append(
+                {
+                    "im_file": im_file,
+                    "shape": tuple(int(v) for v in self.split.hw0[row]),
+                    "cls": lb[:, 0:1].copy(),  # n, 1
+                    "bboxes": lb[:, 1:].copy(),  # n, 4
+                    "segments": [],
+                    "keypoints": None,
+                    "normalized": True,
+                    "bbox_format": "xywh",
+                }
+            )
+        return labels
+
+    def load_image(self, i, rect_mode=True, resize_short=False):
+        if not rect_mode or resize_short:
+            # Other resize modes aren't cached
+            return super().load_image(i, rect_mode, resize_short)
+
+        row = self.rows_[self.im_files[i]]
+        im = self.split.image(row)
+        if self.augment:
+            # Indices only, mosaic picks its partners from here
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                self.buffer.pop(0)
+        return im, tuple(int(v) for v in self.split.hw0[row]), im.shape[:2]
+
+
+def base_yaml(data_yaml):
+    # Subset yamls (see LabelManifest.write_subset) point to the full dataset
+    with open(data_yaml) as f:
+        return yaml.safe_load(f).get("base", data_yaml)
+
+
+def cached_dataset(splits, args, img_path, batch, data, mode, rect, stride, fraction=None):
+    """
+    CachedYOLODataset for img_path if the cache holds that directory, or
+    the images of that .txt list, None otherwise. Arguments as for
+    ultralytics build_yolo_dataset.
+    """
+    if splits is None or isinstance(img_path, list):
+        return None
+    files = None
+    wanted = os.path.realpath(img_path)
+    if os.path.isfile(wanted):
+        with open(wanted) as f:
+            files = {os.path.realpath(line.strip()) for line in f if line.strip()}
+        dirs = {os.path.dirname(file) for file in files}
+        wanted = dirs.pop() if len(dirs) == 1 else None
+    split = next((s for s in splits.values() if s.images_dir == wanted), None)
+    if split is None or args.imgsz != split.imgsz:
+        return None
+
+    return CachedYOLODataset(
+        split,
+        files=files,
+        img_path=img_path,
+        imgsz=args.imgsz,
+        batch_size=batch,
+        augment=mode == "train",
+        hyp=args,
+        rect=args.rect or rect,
+        cache=None,
+        single_cls=args.single_cls or False,
+        stride=stride,
+        pad=0.0 if mode == "train" else 0.5,
+        prefix=colorstr(f"{mode} (cached): "),
+        task=args.task,
+        classes=args.classes,
+        data=data,
+        fraction=fraction if fraction is not None else args.fraction,
+    )
+
+
+class CachedDetectionTrainer(DetectionTrainer):
+    """
+    DetectionTrainer whose train and val datasets come from the DatasetCache
+    built for args.data and args.imgsz (see build_cache.py). Falls back to
+    the normal datasets if there is no up to date cache.
+    """
+
+    def cached_splits(self):
+        if not hasattr(self, "splits_"):
+            self.splits_ = open_cache(base_yaml(self.args.data), self.args.imgsz)
+            if self.splits_ is None:
+                print("No up to date dataset cache, reading the images directly")
+        return self.splits_
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        model = getattr(self.model, "module", self.model)
+        gs = max(int(model.stride.max() if model else 0), 32)
+        dataset = cached_dataset(
+            self.cached_splits(),
+            self.args,
+            img_path,
+            batch,
+            self.data,
+            mode,
+            rect=mode == "val",
+            stride=gs,
+        )
+        return dataset or super().build_dataset(img_path, mode, batch)
+
+    def get_validator(self):
+        self.loss_names = "box_loss", "cls_loss", "dfl_loss"
+        validator = CachedDetectionValidator(
+            self.test_loader, save_dir=self.save_dir, args=copy(self.args), _callbacks=self.callbacks
+        )
+        validator.splits_ = self.cached_splits()
+        return validator
+
+
+class CachedDetectionValidator(DetectionValidator):
+    # Same as CachedDetectionTrainer for model.val(validator=...)
+
+    def cached_splits(self):
+        if not hasattr(self, "splits_"):
+            self.splits_ = open_cache(base_yaml(self.args.data), self.args.imgsz)
+        return self.splits_
+
+    def build_dataset(self, img_path, mode="val", batch=None):
+        dataset = cached_dataset(
+            self.cached_splits(), self.args, img_path, batch, self.data, mode, rect=False, stride=self.stride
+        )
+        return dataset or super().build_dataset(img_path, mode, batch)
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import yaml
+
+# Bump when the layout or the resizing changes, old caches are rebuilt
+CACHE_VERSION = 1
+SPLITS = ["train", "val", "test"]
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp", ".webp"]
+
+
+def cache_dir_for(data_yaml, imgsz):
+    return os.path.join(os.path.dirname(os.path.abspath(data_yaml)), f"cache_{imgsz}")
+
+
+def split_dirs(data_yaml):
+    # Image directories of the splits, relative paths as the scripts use them
+    with open(data_yaml) as f:
+        data = yaml.safe_load(f)
+    return {
+        split: os.path.realpath(data[split])
+        for split in SPLITS
+        if data.get(split)
+    }
+
+
+def label_path(image_path):
+    # YOLO layout: .../images/x.jpg -> .../labels/x.txt
+    images_dir, name = os.path.split(image_path)
+    labels_dir = os.path.join(os.path.dirname(images_dir), "labels")
+    return os.path.join(labels_dir, os.path.splitext(name)[0] + ".txt")
+
+
+def list_images(images_dir):
+    return sorted(
+        name
+        for name in os.listdir(images_dir)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )
+
+
+def read_labels(path):
+    if not os.path.exists(path):
+        return np.zeros((0, 5), dtype=np.float32)
+    labels = np.loadtxt(path, dtype=np.float32, ndmin=2)
+    return labels.reshape(-1, 5) if labels.size else np.zeros((0, 5), dtype=np.float32)
+
+
+def content_hash(dirs, imgsz):
+    """
+    Hash of everything the cache is built from: image names, sizes and
+    modification times, the full label files and the target size. Reading
+    every image would take as long as building the cache itself.
+    """
+    digest = hashlib.sha1(f"{CACHE_VERSION}:{imgsz}".encode())
+    for split, images_dir in sorted(dirs.items()):
+        digest.update(split.encode())
+        for name in list_images(images_dir):
+            path = os.path.join(images_dir, name)
+            stat = os.stat(path)
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+            labels = label_path(path)
+            if os.path.exists(labels):
+                with open(labels, "rb") as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_resized(path, imgsz):
+    # Long side to imgsz, same rounding and interpolation as ultralytics
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        return None, None
+    h0, w0 = image.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        image = cv2.resize(image, (w, h), interpolation=cv2.INTER_LINEAR)
+    return image, (h0, w0)
+
+
+def build_split(images_dir, cache_dir, split, imgsz, workers):
+    names = list_images(images_dir)
+    images_path = os.path.join(cache_dir, f"{split}_images.npy")
+    tmp_path = images_path + ".tmp.npy"
+    images = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.uint8, shape=(len(names), imgsz, imgsz, 3)
+    )
+    hw0 = np.zeros((len(names), 2), dtype=np.int32)
+    hw = np.zeros((len(names), 2), dtype=np.int32)
+    valid = np.ones(len(names), dtype=bool)
+
+    def pack(i):
+        image, shape = load_resized(os.path.join(images_dir, names[i]), imgsz)
+        if image is None:
+            valid[i] = False
+            return
+        h, w = image.shape[:2]
+        images[i, :h, :w] = image
+        hw0[i] = shape
+        hw[i] = (h, w)
+
+    # cv2 releases the GIL while decoding and resizing
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(pack, range(len(names))))
+    images.flush()
+    del images
+    os.replace(tmp_path, images_path)
+
+    labels = [read_labels(label_path(os.path.join(images_dir, name))) for name in names]
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(label) for label in labels])
+    np.savez(
+        os.path.join(cache_dir, f"{split}_index.npz"),
+        names=np.array(names),
+        hw0=hw0,
+        hw=hw,
+        valid=valid,
+        offsets=offsets,
+        labels=np.concatenate(labels) if labels else np.zeros((0, 5), np.float32),
+    )
+    return {"images": images_dir, "count": len(names), "corrupt": int((~valid).sum())}
+
+
+def build_cache(data_yaml, imgsz=128, cache_dir=None, workers=8, force=False):
+    """
+    Decodes, resizes and packs every split of the dataset once into
+    <split>_images.npy, a (N, imgsz, imgsz, 3) uint8 array meant to be
+    memory-mapped, and <split>_index.npz with the original and resized
+    shapes and the labels. meta.json is written last and carries the
+    content hash, an interrupted build is therefore never used.
+    """
+    cache_dir = cache_dir or cache_dir_for(data_yaml, imgsz)
+    dirs = split_dirs(data_yaml)
+    digest = content_hash(dirs, imgsz)
+
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if not force and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f).get("hash") == digest:
+                return cache_dir
+
+    os.makedirs(cache_dir, exist_ok=True)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    meta = {"version": CACHE_VERSION, "imgsz": imgsz, "hash": digest, "splits": {}}
+    for split, images_dir in dirs.items():
+        print(f"Caching {split}: {images_dir}")
+        meta["splits"][split] = build_split(images_dir, cache_dir, split, imgsz, workers)
+
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    return cache_dir
+
+
+class CachedSplit:
+    """
+    One split of a built cache. The image array is opened read-only with
+    mmap on first use, in every dataloader worker separately, so workers
+    share the page cache instead of each holding a copy.
+    """
+
+    def __init__(self, cache_dir, split, images_dir, imgsz):
+        self.cache_dir = cache_dir
+        self.split = split
+        self.images_dir = images_dir
+        self.imgsz = imgsz
+        index = np.load(os.path.join(cache_dir, f"{split}_index.npz"))
+        self.names = [str(name) for name in index["names"]]
+        self.hw0 = index["hw0"]
+        self.hw = index["hw"]
+        self.valid = index["valid"]
+        self.offsets = index["offsets"]
+        self.labels = index["labels"]
+        self.images_ = None
+
+    def __getstate__(self):
+        # Never pickle the mapped array, the worker maps the file itself
+        state = self.__dict__.copy()
+        state["images_"] = None
+        return state
+
+    @property
+    def images(self):
+        if self.images_ is None:
+            self.images_ = np.load(
+                os.path.join(self.cache_dir, f"{self.split}_images.npy"), mmap_mode="r"
+            )
+        return self.images_
+
+    def __len__(self):
+        return len(self.names)
+
+    def path(self, row):
+        return os.path.join(self.images_dir, self.names[row])
+
+    def image(self, row):
+        # Copy of the resized image, augmentations modify it in place
+        h, w = self.hw[row]
+        return self.images[row, :h, :w].copy()
+
+    def labels_of(self, row):
+        return self.labels[self.offsets[row] : self.offsets[row + 1]]
+
+
+def open_cache(data_yaml, imgsz=128, cache_dir=None, check=True):
+    """
+    {split: CachedSplit} of a built cache, None if there is none or (with
+    check=True) it no longer matches the dataset.
+    """
+    cache_dir = cache_dir or cache_dir_for(data_yaml, imgsz)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("version") != CACHE_VERSION or meta.get("imgsz") != imgsz:
+        return None
+    if check and meta.get("hash") != content_hash(split_dirs(data_yaml), imgsz):
+        return None
+    return {
+        split: CachedSplit(cache_dir, split, info["images"], imgsz)
+        for split, info in meta["splits"].items()
+    }
@@ -0,0 +1,94 @@
+import collections
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+from FaceRecognition import draw_detections
+
+
+class DisplaySurface:
+    """
+    Fixed-size RGB surface the video is shown on. Frames are letterboxed
+    (aspect ratio kept) straight into one of a few preallocated buffers,
+    converted BGR -> RGB in place and annotated there. On the Tk thread a
+    single PhotoImage is updated in place from the buffer, so nothing is
+    allocated per frame.
+
+    render() may run on a worker thread, show() must run on the Tk thread.
+    Buffers go back to a free list once shown. Results the pipeline dropped
+    are never shown, so when no buffer is free render() takes the oldest one
+    still waiting to be shown; show() then skips that stale view. A buffer
+    is never written while show() pastes it.
+    """
+
+    def __init__(self, size=(640, 480), buffers=3):
+        self.size = size
+        w, h = size
+        self.buffers_ = [np.zeros((h, w, 3), dtype=np.uint8) for _ in range(buffers)]
+        # letterbox geometry each buffer was last drawn with
+        self.geometry_ = [None] * buffers
+        self.lock_ = threading.Lock()
+        self.free_ = collections.deque(range(buffers))
+        # index -> serial of the view rendered into it, oldest first
+        self.pending_ = collections.OrderedDict()
+        self.serial_ = 0
+        self.photo = None
+
+    def letterbox(self, frame_shape):
+        fh, fw = frame_shape[:2]
+        w, h = self.size
+        scale = min(w / fw, h / fh)
+        nw, nh = int(round(fw * scale)), int(round(fh * scale))
+        return scale, (w - nw) // 2, (h - nh) // 2, nw, nh
+
+    def acquire(self):
+        with self.lock_:
+            if self.free_:
+                index = self.free_.popleft()
+            else:
+                index, _ = self.pending_.popitem(last=False)
+            self.serial_ += 1
+            return index, self.serial_
+
+    def render(self, frame, detections):
+        # The view is (buffer index, serial), only show() needs to read it
+        index, serial = self.acquire()
+        buffer = self.buffers_[index]
+
+        geometry = self.letterbox(frame.shape)
+        scale, left, top, nw, nh = geometry
+        if self.geometry_[index] != geometry:
+            # Borders only need clearing when the frame size changed
+            buffer[:] = 0
+            self.geometry_[index] = geometry
+
+        view = buffer[top : top + nh, left : left + nw]
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        cv2.resize(frame, (nw, nh), dst=view, interpolation=interpolation)
+        cv2.cvtColor(view, cv2.COLOR_BGR2RGB, dst=view)
+
+        # Drawn into the frame area only, the borders stay black
+        draw_detections(view, detections, scale=scale)
+        with self.lock_:
+            self.pending_[index] = serial
+        return index, serial
+
+    def show(self, view, label):
+        # False if the buffer was taken for a newer frame before it was shown
+        index, serial = view
+        with self.lock_:
+            if self.pending_.get(index) != serial:
+                return False
+            del self.pending_[index]
+
+        image = Image.frombuffer("RGB", self.size, self.buffers_[index], "raw", "RGB", 0, 1)
+        if self.photo is None:
+            self.photo = ImageTk.PhotoImage(image)
+            label.configure(image=self.photo)
+        else:
+            # paste() copies the pixels, the buffer is free again afterwards
+            self.photo.paste(image)
+        with self.lock_:
+            self.free_.append(index)
+        return True
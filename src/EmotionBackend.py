@@ -0,0 +1,221 @@
+import abc
+import ast
+import os
+
+import numpy as np
+
+
+def select_device(device=None):
+    # First CUDA GPU if there is one, otherwise CPU
+    if device is not None:
+        return device
+    import torch
+
+    if torch.cuda.is_available():
+        return "0"
+    return "cpu"
+
+
+def preferred_artifact(weights_path, device=None):
+    """
+    On CPU prefer an exported model living next to the .pt checkpoint
+    (see export.py): OpenVINO, then INT8 ONNX, then ONNX.
+    """
+    if select_device(device) != "cpu":
+        return weights_path
+    stem = os.path.splitext(weights_path)[0]
+    for candidate in (
+        stem + "_openvino_model",
+        stem + "_int8.onnx",
+        stem + ".onnx",
+    ):
+        if os.path.exists(candidate):
+            return candidate
+    return weights_path
+
+
+def load_backend(model_path, device=None, conf=0.5):
+    if model_path.endswith(".onnx"):
+        return OnnxBackend(model_path, conf=conf)
+    if model_path.endswith("_openvino_model") or model_path.endswith(".xml"):
+        return OpenVinoBackend(model_path, conf=conf)
+    return TorchBackend(model_path, device=device, conf=conf)
+
+
+class TorchBackend:
+    # Ultralytics YOLO on the .pt checkpoint, a detect or a classify model
+    def __init__(self, model_path, device=None, conf=0.5):
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+        self.task = self.model.task
+        self.device = select_device(device)
+        self.conf = conf
+
+    def warmup(self):
+        self.predict(np.zeros((1, 3, 128, 128), dtype=np.float32))
+
+    def predict(self, batch):
+        # batch is a (n, 3, 128, 128) RGB 0..1 array from CropBatch, given to
+        # ultralytics as one tensor so it skips its per-image letterboxing.
+        # Returns (class_id, conf) or None per face.
+        import torch
+
+        if self.task == "classify":
+            probs = self.predict_proba(batch)
+            return [(int(p.argmax()), float(p.max())) for p in probs]
+
+        results = self.model.predict(
+            torch.from_numpy(batch), device=self.device, conf=self.conf, verbose=False
+        )
+        predictions = []
+        for result in results:
+            box = result.boxes
+            if len(box) > 0:
+                predictions.append((int(box.cls[0].item()), box.conf[0].item()))
+            else:
+                predictions.append(None)
+        return predictions
+
+    def predict_proba(self, batch):
+        # Classify models only: (n, classes) softmax in one forward pass, no
+        # boxes and no NMS
+        import torch
+
+        if self.task != "classify":
+            raise ValueError("predict_proba needs a classification model")
+        results = self.model.predict(
+            torch.from_numpy(batch), device=self.device, verbose=False
+        )
+        return np.stack([result.probs.data.cpu().numpy() for result in results])
+
+
+class StaticBackend(abc.ABC):
+    """
+    Base for exported models with a static (batch, 3, 128, 128) input.
+    Faces are sent in chunks of the exported batch size, padding the last one.
+    """
+
+    def __init__(self, conf=0.5):
+        self.conf = conf
+        self.batch = 1
+        self.imgsz = 128
+        self.dtype = np.float32
+        self.names = {}
+        self.task = "detect"
+        self.padded_ = None
+
+    def warmup(self):
+        self.run(np.zeros((self.batch, 3, self.imgsz, self.imgsz), dtype=self.dtype))
+
+    def postprocess(self, output):
+        if output.ndim == 2:
+            # Classification head output (batch, classes), already softmaxed.
+            # The face is known to be there, so the top class is always kept.
+            probs = output.astype(np.float32)
+            return [(int(p.argmax()), float(p.max())) for p in probs]
+
+        # Detection head output (batch, 4 + classes, anchors). The top box
+        # after NMS is the anchor with the best class score, so NMS itself
+        # is not needed to read off the emotion.
+        scores = output[:, 4:, :].astype(np.float32)
+        best = scores.reshape(scores.shape[0], -1).argmax(axis=1)
+        class_ids = best // scores.shape[2]
+        confs = scores.reshape(scores.shape[0], -1)[np.arange(len(best)), best]
+
+        predictions = []
+        for cls_id, conf in zip(class_ids, confs):
+            if conf >= self.conf:
+                predictions.append((int(cls_id), float(conf)))
+            else:
+                predictions.append(None)
+        return predictions
+
+    def predict(self, batch):
+        predictions = []
+        for output in self.outputs(batch):
+            predictions.extend(self.postprocess(output))
+        return predictions
+
+    def predict_proba(self, batch):
+        # Classify models only: (n, classes) softmax. Copied per chunk, the
+        # runtime may reuse its output buffer for the next one.
+        probs = [np.array(output, dtype=np.float32) for output in self.outputs(batch)]
+        if any(output.ndim != 2 for output in probs):
+            raise ValueError("predict_proba needs a classification model")
+        if not probs:
+            return np.zeros((0, len(self.names)), dtype=np.float32)
+        return np.concatenate(probs)
+
+    def outputs(self, batch):
+        # Raw model output per chunk, the padding rows cut off
+        if self.padded_ is None:
+            self.padded_ = np.zeros(
+                (self.batch, 3, self.imgsz, self.imgsz), dtype=self.dtype
+            )
+
+        for start in range(0, len(batch), self.batch):
+            chunk = batch[start : start + self.batch]
+            n = len(chunk)
+            if n < self.batch or chunk.dtype != self.dtype:
+                self.padded_[:n] = chunk
+                chunk = self.padded_
+            yield self.run(chunk)[:n]
+
+    @abc.abstractmethod
+    def run(self, batch):
+        # Raw output for one full (self.batch, 3, imgsz, imgsz) chunk
+        ...
+
+
+class OnnxBackend(StaticBackend):
+    def __init__(self, model_path, conf=0.5):
+        super().__init__(conf)
+        import onnxruntime as ort
+
+        self.session = ort.InferenceSession(
+            model_path, providers=ort.get_available_providers()
+        )
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.batch, _, self.imgsz, _ = model_input.shape
+        if model_input.type == "tensor(float16)":
+            self.dtype = np.float16
+
+        # Ultralytics stores the class names in the model metadata
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"])
+        self.task = metadata.get("task", self.task)
+
+    def run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoBackend(StaticBackend):
+    def __init__(self, model_path, conf=0.5):
+        super().__init__(conf)
+        import openvino as ov
+        import yaml
+
+        if os.path.isdir(model_path):
+            model_dir = model_path
+            xml = [f for f in os.listdir(model_dir) if f.endswith(".xml")][0]
+            model_path = os.path.join(model_dir, xml)
+        else:
+            model_dir = os.path.dirname(model_path)
+
+        core = ov.Core()
+        model = core.read_model(model_path)
+        self.compiled = core.compile_model(
+            model, "CPU", {"PERFORMANCE_HINT": "LATENCY"}
+        )
+        self.batch, _, self.imgsz, _ = model.inputs[0].get_shape()
+
+        with open(os.path.join(model_dir, "metadata.yaml")) as f:
+            metadata = yaml.safe_load(f)
+        self.names = metadata["names"]
+        self.task = metadata.get("task", self.task)
+
+    def run(self, batch):
+        return self.compiled(batch)[0]
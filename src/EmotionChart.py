@@ -0,0 +1,135 @@
+import time
+
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+import numpy as np
+
+
+class EmotionChart:
+    """
+    Horizontal bar chart of emotion counts drawn with blitting. The static
+    parts (axes, ticks, labels) are rendered once into a cached background,
+    updates only change bar widths and label texts in place and blit them on
+    top. A full redraw happens only when the x scale has to change. Redraws
+    are limited to max_fps, the newest values are drawn once the interval
+    has passed.
+    """
+
+    def __init__(self, master, emotions, max_fps=10):
+        self.emotions = emotions
+        self.min_interval = 1.0 / max_fps
+
+        # Figure instead of pyplot, which is slow to import and not needed
+        # for a chart embedded in Tk
+        fig = Figure(figsize=(6, 3))
+        ax = fig.add_subplot()
+        fig.subplots_adjust(left=0.24)
+
+        values = np.zeros(len(self.emotions))
+
+        self.bars = ax.barh(self.emotions, values, color="#2196F3", animated=True)
+        self.xmax = 20
+        ax.set_xlim(0, self.xmax)
+        ax.set_xlabel("Quantity", color="white")
+        ax.tick_params(axis='x', colors='white')
+        ax.tick_params(axis='y', colors='white')
+
+        fig.patch.set_facecolor("#2b2b2b")
+        ax.spines["top"].set_color("#2b2b2b")
+        ax.spines["right"].set_color("#2b2b2b")
+        ax.spines["left"].set_color("#2196F3")
+        ax.spines["bottom"].set_color("#2196F3")
+        ax.set_facecolor("#2b2b2b")
+        ax.grid(False)
+
+        # One label per bar, created once and only updated afterwards
+        self.labels = [
+            ax.text(
+                0,
+                bar.get_y() + bar.get_height() / 2,
+                "",
+                va="center",
+                ha="center",
+                color="white",
+                fontsize=10,
+                animated=True,
+                visible=False,
+            )
+            for bar in self.bars
+        ]
+
+        self.fig = fig
+        self.ax = ax
+
+        self.pending = None
+        self.last_draw = 0.0
+        self.flush_id = None
+
+        self.canvas = FigureCanvasTkAgg(fig, master=master)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.background = None
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+        self.canvas.draw()
+
+    def on_draw(self, event):
+        # Every full draw (first show, resize, rescale) refreshes the background
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_artists()
+
+    def draw_artists(self):
+        for artist in list(self.bars) + self.labels:
+            self.ax.draw_artist(artist)
+
+    def set_left(self, left):
+        if abs(self.fig.subplotpars.left - left) > 1e-3:
+            self.fig.subplots_adjust(left=left)
+            self.canvas.draw_idle()
+
+    def update(self, class_counts, force=False):
+        self.pending = class_counts
+        wait = self.last_draw + self.min_interval - time.perf_counter()
+        if force or wait <= 0:
+            self.render()
+        elif self.flush_id is None:
+            # Make sure the newest values show up even if no update follows
+            self.flush_id = self.canvas.get_tk_widget().after(
+                int(wait * 1000) + 1, self.flush
+            )
+
+    def flush(self):
+        self.flush_id = None
+        if self.pending is not None:
+            self.render()
+
+    def render(self):
+        class_counts, self.pending = self.pending, None
+        self.last_draw = time.perf_counter()
+
+        counts = [item[0] for item in class_counts.values()]
+        confidences = [item[1] for item in class_counts.values()]
+
+        for bar, label, count, confidence in zip(
+            self.bars, self.labels, counts, confidences
+        ):
+            bar.set_width(count)
+            label.set_visible(count > 0)
+            if count > 0:
+                label.set_x(count + 3)
+                label.set_text(f"{confidence:.4f}")
+
+        if self.rescale(max(counts)) or self.background is None:
+            # Axis changed, full redraw also recaches the background
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.draw_artists()
+            self.canvas.blit(self.fig.bbox)
+
+    def rescale(self, largest):
+        # Grow in steps of 10, shrink only once bars use less than half
+        needed = max(20, largest + 10)
+        if needed > self.xmax or (self.xmax > 20 and needed < self.xmax / 2):
+            self.xmax = max(20, int(np.ceil(needed / 10)) * 10)
+            self.ax.set_xlim(0, self.xmax)
+            return True
+        return False
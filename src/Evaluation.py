@@ -0,0 +1,217 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import polars as pl
+
+from CropBatch import CropBatch
+from EmotionBackend import load_backend
+
+FEATURES_SCHEMA = {
+    "image_hash": pl.String,
+    "brightness": pl.Float32,
+    "contrast": pl.Float32,
+    "saturation": pl.Float32,
+}
+PREDICTIONS_SCHEMA = {
+    "image_hash": pl.String,
+    # -1 when the model found no face
+    "pred": pl.Int32,
+    "conf": pl.Float32,
+}
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_hash(model_path):
+    # Exported OpenVINO models are directories
+    if not os.path.isdir(model_path):
+        return file_hash(model_path)
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(model_path)):
+        path = os.path.join(model_path, name)
+        if os.path.isfile(path):
+            digest.update(name.encode())
+            digest.update(file_hash(path).encode())
+    return digest.hexdigest()
+
+
+def image_features(image):
+    # Simple lighting measures to slice the results by
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    saturation = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)[..., 1]
+    return float(gray.mean()), float(gray.std()), float(saturation.mean())
+
+
+def read_cache(path, schema):
+    if os.path.exists(path):
+        return pl.read_parquet(path)
+    return pl.DataFrame(schema=schema)
+
+
+def write_cache(frame, path):
+    # Written next to the target and swapped in, never left half written
+    tmp_path = path + ".tmp"
+    frame.write_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def predict_images(model_path, paths, cache_dir, device=None, workers=8):
+    """
+    Predictions and image features for `paths`, one row per image in the
+    same order. Results are cached in cache_dir: features per image hash in
+    images.parquet, predictions per model hash and image hash in
+    <model hash>.parquet, so only new images or a new model are run.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        hashes = list(executor.map(file_hash, paths))
+        model_id = model_hash(model_path)
+
+    features_path = os.path.join(cache_dir, "images.parquet")
+    predictions_path = os.path.join(cache_dir, f"{model_id}.parquet")
+    features = read_cache(features_path, FEATURES_SCHEMA)
+    predictions = read_cache(predictions_path, PREDICTIONS_SCHEMA)
+
+    known = set(predictions["image_hash"].to_list()) & set(features["image_hash"].to_list())
+    missing = {}
+    for path, image_hash in zip(paths, hashes):
+        if image_hash not in known:
+            missing.setdefault(image_hash, path)
+
+    if missing:
+        print(f"Running {model_path} on {len(missing)} uncached images")
+        backend = load_backend(model_path, device)
+        backend.warmup()
+        crops = CropBatch(max_faces=16, center_crop=backend.task == "classify")
+
+        def load(image_hash):
+            image = cv2.imread(missing[image_hash])
+            if image is None:
+                raise FileNotFoundError(missing[image_hash])
+            return image_hash, image, image_features(image)
+
+        new_features = {name: [] for name in FEATURES_SCHEMA}
+        new_predictions = {name: [] for name in PREDICTIONS_SCHEMA}
+        batch = []
+        # Decoding runs ahead in the pool while the model works on a batch
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            loaded = executor.map(load, list(missing))
+            for i, item in enumerate(loaded, 1):
+                batch.append(item)
+                if len(batch) < crops.max_faces and i < len(missing):
+                    continue
+
+                results = backend.predict(
+                    crops.fill_crops([image for _, image, _ in batch], swap_rb=True)
+                )
+                for (image_hash, _, (brightness, contrast, saturation)), result in zip(
+                    batch, results
+                ):
+                    new_features["image_hash"].append(image_hash)
+                    new_features["brightness"].append(brightness)
+                    new_features["contrast"].append(contrast)
+                    new_features["saturation"].append(saturation)
+                    cls_id, conf = result if result is not None else (-1, 0.0)
+                    new_predictions["image_hash"].append(image_hash)
+                    new_predictions["pred"].append(int(cls_id))
+                    new_predictions["conf"].append(float(conf))
+                batch = []
+
+        features = pl.concat(
+            [features, pl.DataFrame(new_features, schema=FEATURES_SCHEMA)]
+        ).unique("image_hash", keep="last")
+        predictions = pl.concat(
+            [predictions, pl.DataFrame(new_predictions, schema=PREDICTIONS_SCHEMA)]
+        ).unique("image_hash", keep="last")
+        write_cache(features, features_path)
+        write_cache(predictions, predictions_path)
+
+    images = pl.DataFrame({"image": paths, "image_hash": hashes})
+    # Joins only keep the row order when asked to
+    return images.join(
+        features, on="image_hash", how="left", maintain_order="left"
+    ).join(predictions, on="image_hash", how="left", maintain_order="left")
+
+
+def confusion_matrix(truth, pred, num_classes):
+    """
+    Rows are true classes, columns predicted ones. The extra last column
+    counts images where the model found no face at all.
+    """
+    pred = np.where(pred < 0, num_classes, pred)
+    counts = np.bincount(
+        truth * (num_classes + 1) + pred, minlength=num_classes * (num_classes + 1)
+    )
+    return counts.reshape(num_classes, num_classes + 1)
+
+
+def class_metrics(matrix):
+    num_classes = matrix.shape[0]
+    tp = np.diag(matrix[:, :num_classes]).astype(np.float64)
+    predicted = matrix[:, :num_classes].sum(axis=0)
+    support = matrix.sum(axis=1)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    return precision, recall, support
+
+
+def bin_slices(column, edges):
+    # {"brightness [0, 64)": expression, ...} for consecutive bin edges
+    return {
+        f"{column} [{lo:g}, {hi:g})": (pl.col(column) >= lo) & (pl.col(column) < hi)
+        for lo, hi in zip(edges[:-1], edges[1:])
+    }
+
+
+def tag_slices(tags_csv):
+    """
+    Slices from a CSV with columns image,tag (one row per tagged image,
+    image given by file name), e.g. hand-labelled glasses or skin tone.
+    """
+    tags = pl.read_csv(tags_csv)
+    return {
+        f"tag {tag}": pl.col("name").is_in(group["image"].to_list())
+        for (tag,), group in tags.group_by("tag", maintain_order=True)
+    }
+
+
+def evaluate_slices(results, slices, names):
+    """
+    Confusion matrix, accuracy and per-class precision/recall for every
+    slice. `results` needs the columns truth and pred, `slices` maps a name
+    to a polars filter expression. Only numpy on the cached predictions.
+    """
+    num_classes = len(names)
+    results = results.filter(pl.col("truth") >= 0)
+    report = {}
+    for name, expression in {"all": pl.lit(True), **slices}.items():
+        selected = results.filter(expression)
+        truth = selected["truth"].to_numpy()
+        pred = selected["pred"].to_numpy()
+        matrix = confusion_matrix(truth, pred, num_classes)
+        precision, recall, support = class_metrics(matrix)
+        report[name] = {
+            "images": len(selected),
+            "accuracy": float(np.trace(matrix[:, :num_classes]) / max(1, len(selected))),
+            "macro_recall": float(recall[support > 0].mean()) if support.any() else 0.0,
+            "no_face": int(matrix[:, num_classes].sum()),
+            "per_class": {
+                names[i]: {
+                    "precision": float(precision[i]),
+                    "recall": float(recall[i]),
+                    "support": int(support[i]),
+                }
+                for i in range(num_classes)
+            },
+            "confusion": matrix.tolist(),
+        }
+    return report
@@ -0,0 +1,226 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from FaceTracker import iou
+
+
+class HaarBackend:
+    # Works on the grayscale frame
+    color = False
+
+    def __init__(
+        self,
+        cascade_path=None,
+        scale_factor=1.1,
+        min_neighbors=5,
+        min_size=(0, 0),
+    ):
+        self.cascade_path = cascade_path or (
+            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        )
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.cascade = cv2.CascadeClassifier(self.cascade_path)
+
+    def clone(self):
+        return HaarBackend(
+            self.cascade_path, self.scale_factor, self.min_neighbors, self.min_size
+        )
+
+    def detect(self, image):
+        faces = self.cascade.detectMultiScale(
+            image,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=self.min_size,
+        )
+        return [tuple(face) for face in faces]
+
+
+class YuNetBackend:
+    # OpenCV FaceDetectorYN, model file e.g. face_detection_yunet_2023mar.onnx
+    color = True
+
+    def __init__(self, model_path, score_threshold=0.8, nms_threshold=0.3):
+        self.model_path = model_path
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.net = cv2.FaceDetectorYN.create(
+            model_path, "", (320, 320), score_threshold, nms_threshold
+        )
+
+    def clone(self):
+        return YuNetBackend(self.model_path, self.score_threshold, self.nms_threshold)
+
+    def detect(self, image):
+        h, w = image.shape[:2]
+        self.net.setInputSize((w, h))
+        _, faces = self.net.detect(image)
+        if faces is None:
+            return []
+        return [tuple(int(v) for v in face[:4]) for face in faces]
+
+
+class DnnBackend:
+    # OpenCV res10 SSD face detector (deploy.prototxt + .caffemodel)
+    color = True
+
+    def __init__(self, prototxt_path, model_path, score_threshold=0.6):
+        self.prototxt_path = prototxt_path
+        self.model_path = model_path
+        self.score_threshold = score_threshold
+        self.net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+
+    def clone(self):
+        return DnnBackend(self.prototxt_path, self.model_path, self.score_threshold)
+
+    def detect(self, image):
+        h, w = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(
+            image, 1.0, (300, 300), (104.0, 177.0, 123.0), swapRB=False
+        )
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+
+        faces = []
+        for detection in detections:
+            if detection[2] < self.score_threshold:
+                continue
+            x1, y1, x2, y2 = (detection[3:7] * [w, h, w, h]).astype(int)
+            x1, y1 = max(0, x1), max(0, y1)
+            if x2 > x1 and y2 > y1:
+                faces.append((x1, y1, x2 - x1, y2 - y1))
+        return faces
+
+
+def create_backend(name="haar", model_path=None, **kwargs):
+    if name == "haar":
+        return HaarBackend(model_path, **kwargs)
+    if name == "yunet":
+        return YuNetBackend(model_path, **kwargs)
+    if name == "dnn":
+        # model_path is "deploy.prototxt,res10_300x300_ssd.caffemodel"
+        prototxt_path, caffemodel_path = model_path.split(",")
+        return DnnBackend(prototxt_path, caffemodel_path, **kwargs)
+    raise ValueError(f"Unknown face detector backend: {name}")
+
+
+def suppress_duplicates(faces, threshold=0.3):
+    # Tiles and ROIs overlap, keep the largest of overlapping boxes
+    faces = sorted(faces, key=lambda face: face[2] * face[3], reverse=True)
+    kept = []
+    for face in faces:
+        if all(iou(face, other) < threshold for other in kept):
+            kept.append(face)
+    return kept
+
+
+class FaceDetector:
+    """
+    Runs a detector backend on a downscaled copy of the frame and maps the
+    boxes back to full resolution. The search can be restricted to regions
+    around previously known faces, and large frames can be split into
+    overlapping tiles processed by a thread pool (OpenCV releases the GIL).
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        max_width=640,
+        roi_margin=0.5,
+        tile_size=None,
+        tile_overlap=0.25,
+        workers=4,
+    ):
+        self.backend = backend or HaarBackend()
+        self.max_width = max_width
+        self.roi_margin = roi_margin
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.workers = workers
+
+        self.pool_ = None
+        self.local_ = threading.local()
+
+    def thread_backend(self):
+        # Every pool thread gets its own copy, detectors are not thread safe
+        if threading.current_thread() is threading.main_thread():
+            return self.backend
+        if not hasattr(self.local_, "backend"):
+            self.local_.backend = self.backend.clone()
+        return self.local_.backend
+
+    def detect(self, frame, gray=None, previous=None):
+        if self.backend.color:
+            image = frame
+        else:
+            image = gray if gray is not None else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        h, w = image.shape[:2]
+        scale = 1.0
+        if self.max_width and w > self.max_width:
+            scale = self.max_width / w
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        if previous:
+            regions = self.regions_around(previous, scale, image.shape)
+        elif self.tile_size and max(image.shape[:2]) > self.tile_size:
+            regions = self.tiles(image.shape)
+        else:
+            regions = None
+
+        if regions is None:
+            faces = self.thread_backend().detect(image)
+        else:
+            faces = self.detect_regions(image, regions)
+
+        return [
+            (int(x / scale), int(y / scale), int(fw / scale), int(fh / scale))
+            for x, y, fw, fh in faces
+        ]
+
+    def detect_regions(self, image, regions):
+        def run(region):
+            x1, y1, x2, y2 = region
+            found = self.thread_backend().detect(image[y1:y2, x1:x2])
+            return [(x + x1, y + y1, fw, fh) for x, y, fw, fh in found]
+
+        if len(regions) == 1 or self.workers <= 1:
+            results = [run(region) for region in regions]
+        else:
+            if self.pool_ is None:
+                self.pool_ = ThreadPoolExecutor(max_workers=self.workers)
+            results = list(self.pool_.map(run, regions))
+
+        faces = [face for found in results for face in found]
+        return suppress_duplicates(faces)
+
+    def regions_around(self, boxes, scale, shape):
+        h_max, w_max = shape[:2]
+        regions = []
+        for x, y, w, h in boxes:
+            x, y, w, h = x * scale, y * scale, w * scale, h * scale
+            mx, my = w * self.roi_margin, h * self.roi_margin
+            x1, y1 = int(max(0, x - mx)), int(max(0, y - my))
+            x2, y2 = int(min(w_max, x + w + mx)), int(min(h_max, y + h + my))
+            if x2 > x1 and y2 > y1:
+                regions.append((x1, y1, x2, y2))
+        return regions
+
+    def tiles(self, shape):
+        h_max, w_max = shape[:2]
+        step = max(1, int(self.tile_size * (1 - self.tile_overlap)))
+        regions = []
+        for y in range(0, max(1, h_max - self.tile_size + step), step):
+            for x in range(0, max(1, w_max - self.tile_size + step), step):
+                regions.append(
+                    (x, y, min(w_max, x + self.tile_size), min(h_max, y + self.tile_size))
+                )
+        return regions
+
+    def close(self):
+        if self.pool_ is not None:
+            self.pool_.shutdown(wait=False)
+            self.pool_ = None
@@ -1,84 +1,215 @@
 import cv2
-from ultralytics import YOLO
-import numpy as np
-
-
-class FaceRecognition:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
-        # Load the Face Detector
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+from CropBatch import CropBatch
+from EmotionBackend import load_backend, preferred_artifact
+from FaceDetector import FaceDetector
+from FaceTracker import FaceTracker
+from FrameCache import ChangeDetector, ResultCache
+from Profiler import profiler
+from collections import namedtuple
+
+
+Detection = namedtuple("Detection", ["track_id", "box", "emotion", "conf"])
+
+
+def plot_data_for(detections):
+    return [[detection.emotion, detection.conf] for detection in detections]
+
+
+def draw_detections(image, detections, scale=1.0, offset=(0, 0)):
+    # Boxes are in frame coordinates, scale/offset map them onto the image
+    ox, oy = offset
+    for detection in detections:
+        x1, y1, x2, y2 = (int(v * scale) for v in detection.box)
+        x1, x2 = x1 + ox, x2 + ox
+        y1, y2 = y1 + oy, y2 + oy
+
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(
+            image,
+            f"{detection.emotion} {detection.conf:.2f}",
+            (x1, y1 + 20),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.8,
+            (0, 255, 0),
+            2,
         )
 
-        # Warmup GPU
-        dummy_frame = np.zeros((128, 128, 3), dtype=np.uint8)
-        self.model.predict(dummy_frame, device="0", verbose=False)
 
-    def predict(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=5
-        )
+def annotate_frame(frame, detections):
+    # Annotate stage drawing onto the BGR frame itself, see Pipeline
+    draw_detections(frame, detections)
+    return frame
 
-        plot_data = []
 
-        # If no faces, return early to save time
-        if len(faces) == 0:
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            return frame_rgb, plot_data
+class FaceRecognition:
+    def __init__(
+        self,
+        model_path,
+        detect_every=5,
+        classify_every=10,
+        detector=None,
+        full_detect_every=3,
+        device=None,
+        backend=None,
+        static_threshold=10,
+        cache_size=32,
+    ):
+        # On CPU-only machines an exported ONNX/OpenVINO model is used when
+        # one exists next to the checkpoint. An already loaded backend can be
+        # passed in instead, so several streams share one model.
+        warmup = backend is None
+        self.model = backend or load_backend(
+            preferred_artifact(model_path, device), device
+        )
+        # Load the Face Detector, Haar cascade on a 640 px wide copy by default
+        self.detector = detector or FaceDetector()
+        # Every full_detect_every-th detection scans the whole frame, the ones
+        # in between only search around the tracked faces
+        self.full_detect_every = full_detect_every
+        self.detections_ = 0
+
+        # Full detection runs every detect_every frames, each tracked face
+        # keeps its emotion for classify_every frames
+        self.tracker = FaceTracker(detect_every=detect_every)
+        self.classify_every = classify_every
+
+        # Reused model input for all faces of a frame
+        self.crops = CropBatch(center_crop=self.model.task == "classify")
+        self.face_coords_ = {}
+
+        # Video frames that barely differ from the last analyzed one reuse its
+        # detections, still images are looked up by content
+        self.changes = ChangeDetector(threshold=static_threshold)
+        self.results = ResultCache(cache_size)
+        self.last_ = None
+
+        if warmup:
+            self.model.warmup()
+
+    def reset(self):
+        # Forget tracked faces, e.g. when switching to another source
+        self.tracker.reset()
+        self.detections_ = 0
+        self.changes.reset()
+        self.last_ = None
+
+    def cache_stats(self):
+        return {
+            "static_hits": self.changes.hits,
+            "static_misses": self.changes.misses,
+            "cache_hits": self.results.hits,
+            "cache_misses": self.results.misses,
+        }
+
+    def detect(self, frame, gray):
+        previous = None
+        if self.tracker.tracks and self.detections_ % self.full_detect_every != 0:
+            previous = [track.box for track in self.tracker.tracks]
+        self.detections_ += 1
+        return self.detector.detect(frame, gray, previous=previous)
+
+    def locate(self, frame, track=True):
+        """
+        Detection and tracking half of analyze(). Returns (track, crop_box)
+        for every face whose emotion is due, crop_box as (x1, y1, x2, y2).
+        """
+        with profiler.stage("gray"):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        if not track:
+            # Still images: detect and classify everything from scratch
+            self.reset()
+        if self.tracker.needs_detection():
+            with profiler.stage("detect"):
+                faces = self.detect(frame, gray)
+            self.tracker.update(gray, faces)
+        else:
+            with profiler.stage("track"):
+                self.tracker.track(gray)
 
         # Instead of predicting inside the loop, we gather all faces first.
-        face_crops = []
-        face_coords = []
+        pending = []
+        self.face_coords_ = {}
 
         h_max, w_max = frame.shape[:2]
 
-        for x, y, w, h in faces:
+        for track in self.tracker.tracks:
+            x, y, w, h = track.box
             extend = 20
             x1 = int(max(0, x - extend))
             y1 = int(max(0, y - extend))
             x2 = int(min(w_max, x + w + extend))
             y2 = int(min(h_max, y + h + extend))
-
-            face_crop = frame[y1:y2, x1:x2]
-
-            # Convert to RGB for YOLO
-            face_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
-
-            face_crops.append(face_rgb)
-            face_coords.append((x1, y1, x2, y2))
-
-        # We send the LIST of images. YOLO processes them in parallel.
-        if face_crops:
-            results = self.model.predict(
-                face_crops, device="0", conf=0.5, verbose=False
-            )
-
-            # Map results back to the coordinates
-            for i, result in enumerate(results):
-                box = result.boxes
-                if len(box) > 0:
-                    cls_id = int(box.cls[0].item())
-                    conf = box.conf[0].item()
-                    emotion = self.model.names[cls_id]
-
-                    plot_data.append([emotion, conf])
-
-                    # Retrieve original coordinates
-                    x1, y1, x2, y2 = face_coords[i]
-
-                    # Draw on the original frame
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(
-                        frame,
-                        f"{emotion} {conf:.2f}",
-                        (x1, y1 + 20),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.8,
-                        (0, 255, 0),
-                        2,
-                    )
-
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        return frame_rgb, plot_data
+            self.face_coords_[track.id] = (x1, y1, x2, y2)
+
+            # Tracked faces reuse their emotion until the next re-classification
+            if not track.needs_classification(self.classify_every):
+                continue
+            if x2 <= x1 or y2 <= y1:
+                continue
+
+            pending.append((track, (x1, y1, x2, y2)))
+        return pending
+
+    def assign(self, track, result):
+        # result is (cls_id, conf) from the backend, None if nothing was found
+        track.frames_since_classified = 0
+        if result is not None:
+            cls_id, track.conf = result
+            track.emotion = self.model.names[cls_id]
+        else:
+            track.emotion = None
+
+    def detections(self):
+        return [
+            Detection(track.id, self.face_coords_[track.id], track.emotion, track.conf)
+            for track in self.tracker.tracks
+            if track.emotion is not None
+        ]
+
+    def analyze(self, frame, track=True):
+        """
+        Detects and classifies faces without drawing anything. Returns a list
+        of Detection(track_id, box, emotion, conf) with box as (x1, y1, x2, y2).
+        """
+        if not track:
+            # Still images: the same content always gives the same result
+            key = self.results.key(frame)
+            detections = self.results.get(key)
+            if detections is None:
+                detections = self.run(frame, track=False)
+                self.results.put(key, detections)
+            return detections
+
+        with profiler.stage("change"):
+            changed = self.changes.changed(frame)
+        if changed or self.last_ is None:
+            self.last_ = self.run(frame)
+        return self.last_
+
+    def run(self, frame, track=True):
+        pending = self.locate(frame, track=track)
+
+        # All faces go to the model as one batch tensor
+        for start in range(0, len(pending), self.crops.max_faces):
+            chunk = pending[start : start + self.crops.max_faces]
+            with profiler.stage("crop"):
+                batch = self.crops.fill(
+                    frame, [box for _, box in chunk], swap_rb=True
+                )
+            with profiler.stage("predict"):
+                results = self.model.predict(batch)
+
+            # Map results back to the tracks
+            for (track, _), result in zip(chunk, results):
+                self.assign(track, result)
+
+        return self.detections()
+
+    def predict(self, frame, track=True):
+        # Draws the detections onto the BGR frame itself, the display converts
+        # colors while letterboxing (see DisplaySurface)
+        detections = self.analyze(frame, track=track)
+        with profiler.stage("annotate"):
+            annotate_frame(frame, detections)
+        return frame, plot_data_for(detections)
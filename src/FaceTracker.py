@@ -0,0 +1,181 @@
+import cv2
+import numpy as np
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box  # x, y, w, h in frame coordinates
+        self.template = None
+        self.score = 1.0
+        self.misses = 0
+        # Cached emotion, refreshed every classify_every frames
+        self.emotion = None
+        self.conf = 0.0
+        self.frames_since_classified = None
+
+    def needs_classification(self, classify_every):
+        return (
+            self.frames_since_classified is None
+            or self.frames_since_classified >= classify_every
+        )
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def centroid_distance(a, b):
+    # Distance between centers relative to the size of the first box
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    dx = (ax + aw / 2) - (bx + bw / 2)
+    dy = (ay + ah / 2) - (by + bh / 2)
+    return np.hypot(dx, dy) / max(aw, ah, 1)
+
+
+class FaceTracker:
+    """
+    Keeps face boxes alive between full detections. On detection frames the
+    new boxes are associated with existing tracks by IoU (centroid distance as
+    a fallback), on the frames in between every track follows its face by
+    template matching in a small window around the last position. Full
+    detection is requested every detect_every frames or as soon as a track
+    loses its match.
+    """
+
+    TEMPLATE_SIZE = 32
+
+    def __init__(
+        self,
+        detect_every=5,
+        min_score=0.6,
+        iou_threshold=0.3,
+        max_distance=0.5,
+        max_misses=2,
+    ):
+        self.detect_every = detect_every
+        self.min_score = min_score
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+        self.reset()
+
+    def reset(self):
+        self.tracks = []
+        self.next_id_ = 0
+        self.frames_since_detection_ = None
+
+    def needs_detection(self):
+        if self.frames_since_detection_ is None:
+            return True
+        if self.frames_since_detection_ >= self.detect_every:
+            return True
+        return any(track.score < self.min_score for track in self.tracks)
+
+    def update(self, gray, faces):
+        # Called with fresh detections, faces as (x, y, w, h)
+        faces = [tuple(int(v) for v in face) for face in faces]
+        unmatched = list(range(len(faces)))
+
+        pairs = []
+        for t, track in enumerate(self.tracks):
+            for f in unmatched:
+                overlap = iou(track.box, faces[f])
+                if overlap >= self.iou_threshold:
+                    pairs.append((1.0 + overlap, t, f))
+                else:
+                    distance = centroid_distance(track.box, faces[f])
+                    if distance <= self.max_distance:
+                        pairs.append((1.0 - distance, t, f))
+        # Greedy assignment, best matches first
+        pairs.sort(reverse=True)
+
+        matched_tracks = set()
+        matched_faces = set()
+        for _, t, f in pairs:
+            if t in matched_tracks or f in matched_faces:
+                continue
+            matched_tracks.add(t)
+            matched_faces.add(f)
+            track = self.tracks[t]
+            track.box = faces[f]
+            track.misses = 0
+            self.reset_template(track, gray)
+
+        survivors = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+
+        for f in unmatched:
+            if f in matched_faces:
+                continue
+            track = Track(self.next_id_, faces[f])
+            self.next_id_ += 1
+            self.reset_template(track, gray)
+            survivors.append(track)
+
+        self.tracks = survivors
+        self.frames_since_detection_ = 0
+        self.advance()
+
+    def track(self, gray):
+        # Called on frames without detection
+        for track in self.tracks:
+            self.follow(track, gray)
+        self.frames_since_detection_ += 1
+        self.advance()
+
+    def advance(self):
+        for track in self.tracks:
+            if track.frames_since_classified is not None:
+                track.frames_since_classified += 1
+
+    def reset_template(self, track, gray):
+        x, y, w, h = track.box
+        patch = gray[max(0, y) : y + h, max(0, x) : x + w]
+        if patch.size == 0:
+            track.template = None
+            track.score = 0.0
+            return
+        scale = self.TEMPLATE_SIZE / max(w, h)
+        track.template = cv2.resize(
+            patch, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+        )
+        track.score = 1.0
+
+    def follow(self, track, gray):
+        if track.template is None:
+            track.score = 0.0
+            return
+
+        x, y, w, h = track.box
+        h_max, w_max = gray.shape[:2]
+        # Search window of half a face in every direction
+        mx, my = w // 2, h // 2
+        x1, y1 = max(0, x - mx), max(0, y - my)
+        x2, y2 = min(w_max, x + w + mx), min(h_max, y + h + my)
+
+        scale = self.TEMPLATE_SIZE / max(w, h)
+        window = cv2.resize(
+            gray[y1:y2, x1:x2], None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+        )
+        th, tw = track.template.shape[:2]
+        if window.shape[0] < th or window.shape[1] < tw:
+            track.score = 0.0
+            return
+
+        result = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (bx, by) = cv2.minMaxLoc(result)
+        track.score = score
+        track.box = (x1 + int(bx / scale), y1 + int(by / scale), w, h)
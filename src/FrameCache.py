@@ -0,0 +1,81 @@
+import collections
+import hashlib
+
+import cv2
+import numpy as np
+
+
+class ChangeDetector:
+    """
+    Decides whether a frame differs enough from the last analyzed one to
+    run the models again. Frames are compared as small grayscale
+    thumbnails: every cell averages a block of pixels, so sensor noise
+    cancels out while a face moving or changing expression still shifts
+    a few cells by more than `threshold` gray levels. After `max_static`
+    skipped frames the frame is analyzed anyway.
+    """
+
+    def __init__(self, size=(64, 48), threshold=10, max_static=30):
+        self.size = size
+        self.threshold = threshold
+        self.max_static = max_static
+        self.reference_ = None
+        self.static_ = 0
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self):
+        self.reference_ = None
+        self.static_ = 0
+
+    def thumbnail(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def changed(self, frame):
+        thumbnail = self.thumbnail(frame)
+        if (
+            self.reference_ is not None
+            and self.reference_.shape == thumbnail.shape
+            and self.static_ < self.max_static
+            and np.abs(thumbnail - self.reference_).max() <= self.threshold
+        ):
+            self.static_ += 1
+            self.hits += 1
+            return False
+
+        # Compared against the last analyzed frame, so slow drift adds up
+        self.reference_ = thumbnail
+        self.static_ = 0
+        self.misses += 1
+        return True
+
+
+class ResultCache:
+    # Bounded LRU of analysis results keyed by the exact frame content
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.entries_ = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(frame):
+        digest = hashlib.blake2b(np.ascontiguousarray(frame).data, digest_size=16)
+        digest.update(str(frame.shape).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        if key in self.entries_:
+            self.entries_.move_to_end(key)
+            self.hits += 1
+            return self.entries_[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries_[key] = value
+        self.entries_.move_to_end(key)
+        while len(self.entries_) > self.maxsize:
+            self.entries_.popitem(last=False)
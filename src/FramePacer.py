@@ -0,0 +1,76 @@
+import collections
+import time
+
+
+class FramePacer:
+    """
+    Keeps video playback in real time. Presentation timestamps of the source
+    (CAP_PROP_POS_MSEC) are mapped onto the wall clock at the first frame,
+    and a frame is skipped when, given the measured processing latency, it
+    could only be shown after the next frame is already due. Frames that
+    are early are held back so their result is ready exactly on time.
+    """
+
+    def __init__(self, frame_duration_ms=1000 / 30, smoothing=0.2, fps_window=2.0):
+        self.frame_duration = frame_duration_ms / 1000
+        self.smoothing = smoothing
+        self.fps_window = fps_window
+
+        self.start_wall_ = None
+        self.start_pts_ = None
+        # Exponential moving average of capture -> display time in seconds
+        self.latency = 0.0
+        self.shown_times_ = collections.deque()
+        self.shown = 0
+        self.dropped = 0
+
+    def started(self):
+        return self.start_wall_ is not None
+
+    def restart(self):
+        # The next frame becomes the new reference, e.g. after a seek
+        self.start_wall_ = None
+        self.start_pts_ = None
+
+    def due(self, pts_ms):
+        # Wall clock time at which the frame should be on screen
+        if self.start_wall_ is None:
+            self.start_wall_ = time.perf_counter()
+            self.start_pts_ = pts_ms
+        return self.start_wall_ + (pts_ms - self.start_pts_) / 1000
+
+    def is_late(self, pts_ms):
+        ready = time.perf_counter() + self.latency
+        return ready > self.due(pts_ms) + self.frame_duration
+
+    def skip(self):
+        self.dropped += 1
+
+    def wait(self, pts_ms):
+        # Start processing early enough for the result to be ready on time
+        delay = self.due(pts_ms) - self.latency - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record_latency(self, seconds):
+        self.latency += self.smoothing * (seconds - self.latency)
+
+    def mark_shown(self):
+        now = time.perf_counter()
+        self.shown += 1
+        self.shown_times_.append(now)
+        while self.shown_times_ and now - self.shown_times_[0] > self.fps_window:
+            self.shown_times_.popleft()
+
+    def stats(self):
+        if len(self.shown_times_) > 1:
+            span = self.shown_times_[-1] - self.shown_times_[0]
+            fps = (len(self.shown_times_) - 1) / span if span > 0 else 0.0
+        else:
+            fps = 0.0
+        total = self.shown + self.dropped
+        return {
+            "fps": fps,
+            "dropped_ratio": self.dropped / total if total else 0.0,
+            "latency_ms": self.latency * 1000,
+        }
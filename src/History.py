@@ -0,0 +1,244 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from Plot import CONF_SCALE, EMOTIONS
+
+
+def record_dtype(num_classes):
+    # One closed second as stored on disk, sums in millionths like Plot
+    return np.dtype(
+        [
+            ("time", "<i8"),
+            ("counts", "<i8", (num_classes,)),
+            ("sums", "<i8", (num_classes,)),
+        ]
+    )
+
+
+class Tier:
+    """
+    Fixed number of buckets of `resolution` seconds in preallocated ring
+    arrays. The oldest bucket is overwritten once the ring is full, so
+    memory stays the same however long the session runs.
+    """
+
+    def __init__(self, resolution, capacity, num_classes):
+        self.resolution = resolution
+        self.capacity = capacity
+        # bucket start in seconds since the epoch, -1 for unused slots
+        self.times = np.full(capacity, -1, dtype=np.int64)
+        self.counts = np.zeros((capacity, num_classes), dtype=np.int64)
+        self.sums = np.zeros((capacity, num_classes), dtype=np.int64)
+        self.next_ = 0
+
+        # Bucket still being filled, not in the ring yet
+        self.open_time = None
+        self.open_counts = np.zeros(num_classes, dtype=np.int64)
+        self.open_sums = np.zeros(num_classes, dtype=np.int64)
+
+    def bucket(self, second):
+        return second - second % self.resolution
+
+    def oldest(self):
+        # Start of the oldest bucket still held, None while empty
+        used = self.times[self.times >= 0]
+        if len(used):
+            return int(used.min())
+        return self.open_time
+
+    def add(self, second, counts, sums):
+        """
+        Adds a closed finer bucket. Returns the bucket this tier closed on the
+        way as (time, counts, sums), or None.
+        """
+        start = self.bucket(second)
+        closed = None
+        if self.open_time is not None and start != self.open_time:
+            closed = self.close()
+        self.open_time = start
+        self.open_counts += counts
+        self.open_sums += sums
+        return closed
+
+    def close(self):
+        slot = self.next_
+        self.next_ = (self.next_ + 1) % self.capacity
+        closed = (self.open_time, self.open_counts.copy(), self.open_sums.copy())
+        self.times[slot], self.counts[slot], self.sums[slot] = closed
+        self.open_counts[:] = 0
+        self.open_sums[:] = 0
+        self.open_time = None
+        return closed
+
+    def totals(self, start, end):
+        # Counts and sums of the buckets starting in [start, end)
+        mask = (self.times >= start) & (self.times < end)
+        counts = self.counts[mask].sum(axis=0)
+        sums = self.sums[mask].sum(axis=0)
+        if self.open_time is not None and start <= self.open_time < end:
+            counts += self.open_counts
+            sums += self.open_sums
+        return counts, sums
+
+    def series(self, start, end):
+        # Buckets in [start, end) in time order, the open one included
+        mask = (self.times >= start) & (self.times < end)
+        order = np.argsort(self.times[mask])
+        times = self.times[mask][order]
+        counts = self.counts[mask][order]
+        sums = self.sums[mask][order]
+        if self.open_time is not None and start <= self.open_time < end:
+            times = np.append(times, self.open_time)
+            counts = np.vstack([counts, self.open_counts])
+            sums = np.vstack([sums, self.open_sums])
+        return times, counts, sums
+
+
+class EmotionHistory:
+    """
+    Whole-session emotion history in bounded memory. Faces are summed per
+    second, and every closed second rolls up into a minute and every minute
+    into an hour, so the last hour is kept per second, the last day per
+    minute and the last 90 days per hour. Closed seconds are appended to
+    `path` by a background thread every `flush_every` seconds.
+    """
+
+    # (resolution in seconds, buckets kept)
+    TIERS = ((1, 3600), (60, 1440), (3600, 24 * 90))
+
+    def __init__(self, path=None, names=EMOTIONS, flush_every=10.0):
+        self.names_ = list(names)
+        self.classIds_ = {name: i for i, name in enumerate(self.names_)}
+        numClasses = len(self.names_)
+        self.tiers = [Tier(resolution, capacity, numClasses) for resolution, capacity in self.TIERS]
+        self.started = None
+
+        self.path = path
+        self.dtype = record_dtype(numClasses)
+        self.pending_ = []
+        self.lock_ = threading.Lock()
+        self.stop_ = threading.Event()
+        self.thread_ = None
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(os.path.splitext(path)[0] + ".json", "w") as f:
+                json.dump({"names": self.names_, "dtype": self.dtype.descr}, f, indent=2)
+            self.thread_ = threading.Thread(
+                target=self.flush_loop, args=(flush_every,), daemon=True
+            )
+            self.thread_.start()
+
+    def update(self, emotionsOnFrame, timestamp=None):
+        # Same input as Plot.update: [emotion, confidence] per face
+        classIds = [self.classIds_[box[0]] for box in emotionsOnFrame]
+        confidences = [box[1] for box in emotionsOnFrame]
+        self.updateArrays(classIds, confidences, timestamp)
+
+    def updateArrays(self, classIds, confidences, timestamp=None):
+        # timestamp in seconds since the epoch, the history outlives restarts
+        if timestamp is None:
+            timestamp = time.time()
+        second = int(timestamp)
+        numClasses = len(self.names_)
+        classIds = np.asarray(classIds, dtype=np.int64)
+        fixed = np.rint(np.asarray(confidences, dtype=np.float64) * CONF_SCALE)
+        counts = np.bincount(classIds, minlength=numClasses)
+        sums = np.bincount(classIds, weights=fixed, minlength=numClasses).astype(np.int64)
+
+        with self.lock_:
+            if self.started is None:
+                self.started = second
+            closed = self.tiers[0].add(second, counts, sums)
+            if closed is not None:
+                self.pending_.append(closed)
+                # A closed bucket of one tier is one input of the next
+                for tier in self.tiers[1:]:
+                    closed = tier.add(*closed)
+                    if closed is None:
+                        break
+
+    def tier_for(self, start):
+        # Finest tier that still reaches back to start, or to the session start
+        if self.started is not None:
+            start = max(start, self.started)
+        for tier in self.tiers:
+            oldest = tier.oldest()
+            if oldest is not None and oldest <= start:
+                return tier
+        return self.tiers[-1]
+
+    def totals(self, start, end):
+        with self.lock_:
+            tier = self.tier_for(start)
+            # Whole buckets only, a coarse tier rounds start down
+            counts, sums = tier.totals(tier.bucket(int(start)), end)
+            # Buckets the finer tiers are still filling are not rolled up yet
+            for finer in self.tiers[: self.tiers.index(tier)]:
+                if finer.open_time is not None and finer.open_time < end:
+                    counts += finer.open_counts
+                    sums += finer.open_sums
+            return counts, sums
+
+    def counts(self, start, end=None):
+        """
+        Faces per emotion and mean confidence between start and end (seconds
+        since the epoch), in the {name: [count, mean]} format of Plot.counts.
+        """
+        if end is None:
+            end = time.time() + 1
+        counts, sums = self.totals(start, end)
+        means = np.zeros(len(counts), dtype=np.float64)
+        np.divide(sums, counts * CONF_SCALE, out=means, where=counts > 0)
+        return {
+            name: [int(count), float(mean)]
+            for name, count, mean in zip(self.names_, counts, means)
+        }
+
+    def series(self, start, end=None):
+        # (bucket times, counts, mean confidences) at the finest resolution left
+        if end is None:
+            end = time.time() + 1
+        with self.lock_:
+            times, counts, sums = self.tier_for(start).series(start, end)
+        means = np.zeros(counts.shape, dtype=np.float64)
+        np.divide(sums, counts * CONF_SCALE, out=means, where=counts > 0)
+        return times, counts, means
+
+    def flush(self):
+        with self.lock_:
+            pending, self.pending_ = self.pending_, []
+        if not pending or self.path is None:
+            return
+        records = np.zeros(len(pending), dtype=self.dtype)
+        for record, (second, counts, sums) in zip(records, pending):
+            record["time"], record["counts"], record["sums"] = second, counts, sums
+        # Append only, a crash loses at most the records not flushed yet
+        with open(self.path, "ab") as f:
+            f.write(records.tobytes())
+
+    def flush_loop(self, interval):
+        while not self.stop_.wait(interval):
+            self.flush()
+
+    def close(self):
+        # The open second is written too, nothing of the session is lost
+        with self.lock_:
+            if self.tiers[0].open_time is not None:
+                self.pending_.append(self.tiers[0].close())
+        self.stop_.set()
+        if self.thread_ is not None:
+            self.thread_.join(timeout=1.0)
+        self.flush()
+
+
+def read_history(path):
+    # Every flushed second, a torn record at the end of the file is ignored
+    with open(os.path.splitext(path)[0] + ".json") as f:
+        names = json.load(f)["names"]
+    dtype = record_dtype(len(names))
+    size = os.path.getsize(path) // dtype.itemsize
+    return names, np.fromfile(path, dtype=dtype, count=size)
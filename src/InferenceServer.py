@@ -0,0 +1,310 @@
+import asyncio
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from CropBatch import CropBatch
+from EmotionBackend import load_backend, preferred_artifact
+from FaceRecognition import FaceRecognition
+from StreamProtocol import decode_image, read_message, split_crops, write_message
+
+
+class StreamMetrics:
+    def __init__(self, window=512):
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.faces = 0
+        self.started = time.perf_counter()
+        # receive -> reply times of the last `window` processed messages
+        self.latencies_ = collections.deque(maxlen=window)
+
+    def record(self, latency, faces):
+        self.processed += 1
+        self.faces += faces
+        self.latencies_.append(latency)
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        stats = {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "faces": self.faces,
+            "fps": self.processed / elapsed if elapsed > 0 else 0.0,
+        }
+        if self.latencies_:
+            p50, p95, p99 = np.percentile(np.asarray(self.latencies_) * 1000, [50, 95, 99])
+            stats.update(p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99))
+        return stats
+
+
+class MicroBatcher:
+    """
+    Collects face crops from all streams into shared model calls. A batch
+    runs as soon as it holds max_batch crops or max_latency_ms after its
+    first crop arrived, whichever comes first. The queue is bounded, so when
+    the model falls behind submit() waits and the streams stop taking frames.
+    """
+
+    def __init__(self, backend, max_batch=16, max_latency_ms=10, max_pending=256):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        self.queue_ = asyncio.Queue(max_pending)
+        self.crops = CropBatch(
+            max_faces=max_batch, center_crop=backend.task == "classify"
+        )
+        # The model is only ever called from this one thread
+        self.executor_ = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.batched = 0
+
+    def pending(self):
+        return self.queue_.qsize()
+
+    async def submit(self, crop):
+        # crop is a BGR image, returns (cls_id, conf) or None
+        future = asyncio.get_running_loop().create_future()
+        await self.queue_.put((crop, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue_.get()]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch:
+                if not self.queue_.empty():
+                    batch.append(self.queue_.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue_.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            crops = [crop for crop, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor_, self.predict, crops)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def predict(self, crops):
+        self.batches += 1
+        self.batched += len(crops)
+        return self.backend.predict(self.crops.fill_crops(crops, swap_rb=True))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "mean_batch": self.batched / self.batches if self.batches else 0.0,
+            "pending": self.pending(),
+        }
+
+
+class Stream:
+    def __init__(self, name, recognition):
+        self.name = name
+        # Detection and tracking state of this stream, the model is shared
+        self.recognition = recognition
+        self.metrics = StreamMetrics()
+        # Newest message not yet processed, (header, payload, received)
+        self.latest = None
+        self.ready = asyncio.Event()
+
+
+class InferenceServer:
+    """
+    One emotion model for many streams. Every connection is a stream with
+    its own detector and tracker; the face crops of all streams meet in the
+    MicroBatcher. Each stream has at most one message waiting: a newer one
+    replaces it and the old one is answered as dropped, so a slow server
+    never builds up latency.
+
+    A connection whose first message is a metrics request gets the metrics
+    and is closed, it never becomes a stream. Streams that disconnected are
+    kept in the metrics with their final numbers, the last `keep_closed` of
+    them by name, all of them in the totals.
+    """
+
+    def __init__(
+        self,
+        model_path,
+        device=None,
+        max_batch=16,
+        max_latency_ms=10,
+        max_pending=256,
+        keep_closed=64,
+        **recognition_kwargs,
+    ):
+        self.model_path = model_path
+        self.backend = load_backend(preferred_artifact(model_path, device), device)
+        self.backend.warmup()
+        self.batcher = MicroBatcher(self.backend, max_batch, max_latency_ms, max_pending)
+        self.recognition_kwargs = recognition_kwargs
+        self.streams = {}
+        self.closed = collections.OrderedDict()
+        self.keep_closed = keep_closed
+        self.closed_totals_ = dict.fromkeys(
+            ("streams", "received", "processed", "dropped", "faces"), 0
+        )
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        batcher = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+    def metrics(self):
+        streams = {name: stream.metrics.stats() for name, stream in self.streams.items()}
+        totals = dict(self.closed_totals_)
+        totals["streams"] += len(streams)
+        for stats in streams.values():
+            for key in ("received", "processed", "dropped", "faces"):
+                totals[key] += stats[key]
+        return {
+            "streams": streams,
+            "closed": dict(self.closed),
+            "totals": totals,
+            **self.batcher.stats(),
+        }
+
+    def close_stream(self, name):
+        # Final numbers of the stream stay in the metrics
+        stats = self.streams.pop(name).metrics.stats()
+        self.closed[name] = stats
+        self.closed.move_to_end(name)
+        while len(self.closed) > self.keep_closed:
+            self.closed.popitem(last=False)
+        self.closed_totals_["streams"] += 1
+        for key in ("received", "processed", "dropped", "faces"):
+            self.closed_totals_[key] += stats[key]
+
+    async def handle(self, reader, writer):
+        message = await read_message(reader)
+        if message is not None and message[0].get("type") == "metrics":
+            await write_message(writer, {"type": "metrics", **self.metrics()})
+        if message is None or message[0].get("type") != "hello":
+            writer.close()
+            return
+
+        name = message[0].get("stream") or "stream"
+        while name in self.streams:
+            name += "+"
+        stream = Stream(
+            name,
+            FaceRecognition(self.model_path, backend=self.backend, **self.recognition_kwargs),
+        )
+        self.streams[name] = stream
+        worker = asyncio.create_task(self.work(stream, writer))
+
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                header, payload = message
+                kind = header.get("type")
+                if kind == "metrics":
+                    await write_message(writer, {"type": "metrics", **self.metrics()})
+                elif kind in ("frame", "crops"):
+                    stream.metrics.received += 1
+                    if stream.latest is not None:
+                        stream.metrics.dropped += 1
+                        dropped = stream.latest[0].get("seq")
+                        await write_message(writer, {"seq": dropped, "status": "dropped"})
+                    stream.latest = (header, payload, time.perf_counter())
+                    stream.ready.set()
+        finally:
+            worker.cancel()
+            self.close_stream(name)
+            writer.close()
+
+    async def work(self, stream, writer):
+        while True:
+            await stream.ready.wait()
+            stream.ready.clear()
+            header, payload, received = stream.latest
+            stream.latest = None
+
+            try:
+                if header["type"] == "frame":
+                    faces = await self.classify_frame(stream, payload)
+                else:
+                    faces = await self.classify_crops(header, payload)
+            except Exception as e:
+                await write_message(
+                    writer, {"seq": header.get("seq"), "status": "error", "error": str(e)}
+                )
+                continue
+
+            latency = time.perf_counter() - received
+            stream.metrics.record(latency, len(faces))
+            await write_message(
+                writer,
+                {
+                    "seq": header.get("seq"),
+                    "status": "ok",
+                    "faces": faces,
+                    "latency_ms": latency * 1000,
+                },
+            )
+
+    def locate(self, stream, payload):
+        frame = decode_image(payload)
+        if frame is None:
+            raise ValueError("Could not decode frame")
+        return frame, stream.recognition.locate(frame)
+
+    async def classify_frame(self, stream, payload):
+        # Decoding, detection and tracking run off the event loop
+        loop = asyncio.get_running_loop()
+        frame, pending = await loop.run_in_executor(None, self.locate, stream, payload)
+        results = await asyncio.gather(
+            *(self.batcher.submit(frame[y1:y2, x1:x2]) for _, (x1, y1, x2, y2) in pending)
+        )
+        for (track, _), result in zip(pending, results):
+            stream.recognition.assign(track, result)
+
+        return [
+            {
+                "track_id": detection.track_id,
+                "box": [int(v) for v in detection.box],
+                "emotion": detection.emotion,
+                "conf": float(detection.conf),
+            }
+            for detection in stream.recognition.detections()
+        ]
+
+    async def classify_crops(self, header, payload):
+        # Faces the client already cut out, classified as they are
+        loop = asyncio.get_running_loop()
+        crops = await loop.run_in_executor(None, split_crops, payload, header["sizes"])
+        if any(crop is None for crop in crops):
+            raise ValueError("Could not decode crop")
+        results = await asyncio.gather(*(self.batcher.submit(crop) for crop in crops))
+
+        faces = []
+        for index, result in enumerate(results):
+            if result is None:
+                faces.append({"index": index, "emotion": None, "conf": 0.0})
+            else:
+                cls_id, conf = result
+                faces.append(
+                    {"index": index, "emotion": self.backend.names[cls_id], "conf": float(conf)}
+                )
+        return faces
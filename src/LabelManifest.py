@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import polars as pl
+import yaml
+
+from DatasetCache import label_path, list_images, read_labels, split_dirs
+
+SCHEMA = {
+    "split": pl.String,
+    "image": pl.String,
+    "classes": pl.List(pl.Int32),
+    "boxes": pl.List(pl.Array(pl.Float32, 4)),
+    "empty": pl.Boolean,
+    # most frequent class of the image, -1 if it has no labels
+    "primary": pl.Int32,
+}
+
+
+def manifest_path_for(data_yaml):
+    return os.path.join(os.path.dirname(os.path.abspath(data_yaml)), "labels_manifest.parquet")
+
+
+def fingerprint(dirs):
+    """
+    Cheap staleness check from the image and label directories alone:
+    adding, removing or renaming a file changes the directory mtime and
+    the file count. Edits inside a label file don't, rebuild for those.
+    """
+    digest = hashlib.sha1()
+    for _, images_dir in sorted(dirs.items()):
+        labels_dir = os.path.join(os.path.dirname(images_dir), "labels")
+        for directory in (images_dir, labels_dir):
+            if os.path.isdir(directory):
+                stat = os.stat(directory)
+                count = len(os.listdir(directory))
+                digest.update(f"{directory}:{stat.st_mtime_ns}:{count}".encode())
+    return digest.hexdigest()
+
+
+def histograms(manifest, num_classes):
+    # Per split: boxes per class, images containing each class, empty images
+    result = {}
+    for split in manifest["split"].unique().sort().to_list():
+        rows = manifest.filter(pl.col("split") == split)
+        classes = rows["classes"].explode().drop_nulls().to_numpy()
+        per_image = rows["classes"].list.unique().explode().drop_nulls().to_numpy()
+        result[split] = {
+            "images": len(rows),
+            "empty": int(rows["empty"].sum()),
+            "boxes": np.bincount(classes, minlength=num_classes).tolist(),
+            "images_with": np.bincount(per_image, minlength=num_classes).tolist(),
+        }
+    return result
+
+
+def build_manifest(data_yaml, path=None):
+    """
+    One pass over every image and label file of the dataset. Writes the
+    manifest as Parquet (one row per image) and the fingerprint and class
+    histograms next to it as JSON.
+    """
+    path = path or manifest_path_for(data_yaml)
+    dirs = split_dirs(data_yaml)
+    rows = {name: [] for name in SCHEMA}
+    for split, images_dir in dirs.items():
+        for name in list_images(images_dir):
+            image = os.path.join(images_dir, name)
+            labels = read_labels(label_path(image))
+            classes = labels[:, 0].astype(np.int32)
+            rows["split"].append(split)
+            rows["image"].append(image)
+            rows["classes"].append(classes.tolist())
+            rows["boxes"].append(labels[:, 1:].tolist())
+            rows["empty"].append(len(classes) == 0)
+            rows["primary"].append(int(np.bincount(classes).argmax()) if len(classes) else -1)
+
+    manifest = pl.DataFrame(rows, schema=SCHEMA)
+    manifest.write_parquet(path)
+
+    with open(data_yaml) as f:
+        num_classes = yaml.safe_load(f)["nc"]
+    with open(os.path.splitext(path)[0] + ".json", "w") as f:
+        json.dump(
+            {"fingerprint": fingerprint(dirs), "histograms": histograms(manifest, num_classes)},
+            f,
+            indent=2,
+        )
+    return manifest
+
+
+def load_manifest(data_yaml, path=None, rebuild=False):
+    # The stored manifest unless it is missing or the dataset changed
+    path = path or manifest_path_for(data_yaml)
+    info_path = os.path.splitext(path)[0] + ".json"
+    if not rebuild and os.path.exists(path) and os.path.exists(info_path):
+        with open(info_path) as f:
+            if json.load(f).get("fingerprint") == fingerprint(split_dirs(data_yaml)):
+                return pl.read_parquet(path)
+    return build_manifest(data_yaml, path)
+
+
+def proportional_quota(available, total):
+    # Largest remainder rounding, every stratum keeps its share
+    exact = available * total / available.sum()
+    quota = np.floor(exact).astype(np.int64)
+    for i in np.argsort(quota - exact)[: total - quota.sum()]:
+        quota[i] += 1
+    return np.minimum(quota, available)
+
+
+def balanced_quota(available, total):
+    # Equal share per stratum, what small ones can't fill goes to the rest
+    quota = np.zeros_like(available)
+    remaining = total
+    while remaining > 0:
+        open_ = np.flatnonzero(quota < available)
+        if len(open_) == 0:
+            break
+        share = max(1, remaining // len(open_))
+        for i in open_:
+            take = min(share, available[i] - quota[i], remaining)
+            quota[i] += take
+            remaining -= take
+            if remaining == 0:
+                break
+    return quota
+
+
+def stratified_subset(manifest, split="train", fraction=None, size=None, balanced=False, seed=0):
+    """
+    Image paths of a random subset of `split` with `size` images (or
+    `fraction` of the split), stratified by the primary class of each image.
+    With balanced=True every class gets the same number of images as far
+    as it has them, otherwise the class distribution of the split is kept.
+    Empty images always keep their proportional share.
+    """
+    rows = manifest.filter(pl.col("split") == split)
+    primary = rows["primary"].to_numpy()
+    images = rows["image"].to_list()
+    total = size if size is not None else int(round(len(images) * fraction))
+    total = min(total, len(images))
+
+    strata, available = np.unique(primary, return_counts=True)
+    if balanced:
+        # Empty images get their proportional share, classes split the rest
+        quota = np.zeros_like(available)
+        labeled = strata >= 0
+        if not labeled.all():
+            empty = proportional_quota(available, total)[~labeled]
+            quota[~labeled] = empty
+        quota[labeled] = balanced_quota(available[labeled], total - quota[~labeled].sum())
+    else:
+        quota = proportional_quota(available, total)
+
+    rng = np.random.default_rng(seed)
+    picked = []
+    for stratum, count in zip(strata, quota):
+        members = np.flatnonzero(primary == stratum)
+        picked.extend(rng.choice(members, count, replace=False).tolist())
+    return sorted(images[i] for i in picked)
+
+
+def write_subset(data_yaml, images, name):
+    """
+    Writes the image list to subsets/<name>.txt next to data.yaml and a
+    <name>.yaml training on it, with the full val and test splits. Returns
+    the path of the new yaml, to be passed as data= to model.train.
+    """
+    with open(data_yaml) as f:
+        data = yaml.safe_load(f)
+    out_dir = os.path.join(os.path.dirname(os.path.abspath(data_yaml)), "subsets")
+    os.makedirs(out_dir, exist_ok=True)
+
+    list_path = os.path.join(out_dir, f"{name}.txt")
+    with open(list_path, "w") as f:
+        f.write("\n".join(images) + "\n")
+
+    # Absolute paths, relative ones would now resolve from subsets/
+    dirs = split_dirs(data_yaml)
+    data.update(dirs)
+    data["train"] = list_path
+    data.pop("data", None)
+    # Lets CachedDetectionTrainer find the cache of the full dataset
+    data["base"] = os.path.abspath(data_yaml)
+    subset_yaml = os.path.join(out_dir, f"{name}.yaml")
+    with open(subset_yaml, "w") as f:
+        yaml.safe_dump(data, f, sort_keys=False)
+    return subset_yaml
@@ -0,0 +1,108 @@
+import glob
+import json
+import os
+import platform
+
+import polars as pl
+
+# Validation metric per task, as ultralytics writes it to results.csv. The
+# two are not comparable, checkpoints are only ranked against their own task.
+METRICS = {
+    "detect": "metrics/mAP50-95(B)",
+    "classify": "metrics/accuracy_top1",
+}
+
+
+def task_of(accuracy):
+    return next(task for task, metric in METRICS.items() if metric == accuracy["metric"])
+
+
+def find_checkpoints(results_dir="./results"):
+    return sorted(glob.glob(os.path.join(results_dir, "*", "weights", "*.pt")))
+
+
+def machine_id():
+    # Latencies only hold on the machine they were measured on
+    return f"{platform.node()}|{platform.processor() or platform.machine()}|{os.cpu_count()}"
+
+
+def read_accuracy(weights_path):
+    """
+    Validation accuracy of a checkpoint from the results.csv its training
+    run wrote: best.pt is the epoch with the best fitness, any other
+    checkpoint the last epoch. None if the run has no usable results.csv.
+    """
+    run_dir = os.path.dirname(os.path.dirname(weights_path))
+    csv_path = os.path.join(run_dir, "results.csv")
+    if not os.path.exists(csv_path):
+        return None
+    df = pl.read_csv(csv_path)
+    # Older ultralytics versions pad the header with spaces
+    df = df.rename({column: column.strip() for column in df.columns})
+
+    if METRICS["detect"] in df.columns:
+        metric = METRICS["detect"]
+        # Same weighting ultralytics picks best.pt by
+        fitness = 0.1 * df["metrics/mAP50(B)"] + 0.9 * df[metric]
+    elif METRICS["classify"] in df.columns:
+        metric = METRICS["classify"]
+        fitness = df[metric]
+    else:
+        return None
+
+    row = fitness.arg_max() if os.path.basename(weights_path) == "best.pt" else df.height - 1
+    return {
+        "metric": metric,
+        "value": float(df[metric][row]),
+        "epoch": int(df["epoch"][row]),
+        "source": "results.csv",
+    }
+
+
+def latency_ms(entry, batch_size=1, stat="p95_ms"):
+    # JSON keys are strings
+    return entry["latency"][str(batch_size)][stat]
+
+
+def pareto_front(entries, batch_size=1, stat="p95_ms"):
+    """
+    Entries no other entry beats on both latency and accuracy, fastest
+    first. Entries without an accuracy are left out, entries of different
+    accuracy metrics can't be ranked together and raise a ValueError.
+    """
+    rated = [entry for entry in entries if entry.get("accuracy")]
+    metrics = {entry["accuracy"]["metric"] for entry in rated}
+    if len(metrics) > 1:
+        raise ValueError(f"Can't rank different metrics together: {sorted(metrics)}")
+    rated.sort(key=lambda entry: (latency_ms(entry, batch_size, stat), -entry["accuracy"]["value"]))
+    front = []
+    for entry in rated:
+        if not front or entry["accuracy"]["value"] > front[-1]["accuracy"]["value"]:
+            front.append(entry)
+    return front
+
+
+def select_model(report, budget_ms, task="detect", batch_size=1, stat="p95_ms"):
+    """
+    Most accurate entry of the report for `task` whose latency fits
+    budget_ms, or the fastest one if none does. None if the report has no
+    checkpoint of that task.
+    """
+    entries = [entry for entry in report["entries"] if entry["task"] == task]
+    front = pareto_front(entries, batch_size, stat)
+    if not front:
+        return None
+    fitting = [entry for entry in front if latency_ms(entry, batch_size, stat) <= budget_ms]
+    # The front is sorted by latency and accuracy both
+    return fitting[-1] if fitting else front[0]
+
+
+def load_report(path):
+    # The report if it exists and was measured on this machine
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        report = json.load(f)
+    if report.get("machine") != machine_id():
+        return None
+    return report
@@ -0,0 +1,308 @@
+import collections
+import threading
+import time
+
+import cv2
+from Profiler import profiler
+
+# One analyzed frame. detections as FaceRecognition.analyze returns them,
+# view is whatever the annotate stage made of the frame (None without one).
+FrameResult = collections.namedtuple(
+    "FrameResult",
+    ["index", "timestamp_ms", "frame", "detections", "view", "read_time"],
+    defaults=(None, None),
+)
+
+
+class LatestQueue:
+    # Bounded queue where a new item pushes out the oldest one when full,
+    # so the consumer always works on the freshest frame. With drop=False
+    # put() waits for space instead, nothing is lost.
+    def __init__(self, maxsize=1, drop=True):
+        self.maxsize = maxsize
+        self.drop = drop
+        self.items_ = collections.deque()
+        self.cond_ = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.cond_:
+            if not self.drop:
+                self.cond_.wait_for(
+                    lambda: len(self.items_) < self.maxsize or self.closed
+                )
+                if self.closed:
+                    return
+            elif len(self.items_) >= self.maxsize:
+                self.items_.popleft()
+                self.dropped += 1
+            self.items_.append(item)
+            self.cond_.notify_all()
+
+    def get(self, timeout=None):
+        with self.cond_:
+            self.cond_.wait_for(lambda: self.items_ or self.closed, timeout)
+            if not self.items_:
+                return None
+            item = self.items_.popleft()
+            self.cond_.notify_all()
+            return item
+
+    def get_nowait(self):
+        with self.cond_:
+            if not self.items_:
+                return None
+            item = self.items_.popleft()
+            self.cond_.notify_all()
+            return item
+
+    def empty(self):
+        with self.cond_:
+            return not self.items_
+
+    def wait_empty(self, timeout=None):
+        with self.cond_:
+            return self.cond_.wait_for(
+                lambda: not self.items_ or self.closed, timeout
+            )
+
+    def close(self):
+        with self.cond_:
+            self.closed = True
+            self.cond_.notify_all()
+
+
+class Pipeline:
+    """
+    Runs capture -> inference -> annotate on background threads, the one
+    path every front end uses. The stages are connected by bounded queues:
+    for live sources they are latest-frame-wins, so a slow stage makes the
+    previous one drop frames instead of the consumer falling behind; with
+    lossless=True every frame is processed in order. The annotate stage is
+    optional, e.g. DisplaySurface.render for the GUI or annotate_frame to
+    draw onto the frame itself.
+
+    Results are picked up with get_result() from a UI loop, or iterated
+    with stream(). process() runs the same stages inline on one frame.
+
+    model may also be a list of models, one inference thread each. That only
+    works for untracked sources like still images, as every model keeps its
+    own tracking state, and results may then come out of capture order
+    (FrameResult.index keeps it).
+    """
+
+    def __init__(
+        self,
+        cap,
+        model,
+        annotate=None,
+        queue_size=1,
+        lossless=False,
+        track=None,
+        recorder=None,
+    ):
+        # cap is a source from Sources.open_source, a cv2.VideoCapture or
+        # anything with the same read()/release()
+        self.cap = cap
+        self.models = list(model) if isinstance(model, (list, tuple)) else [model]
+        self.model = self.models[0]
+        # annotate(frame, detections) -> view, run on its own thread
+        self.annotate = annotate
+        # Still images are analyzed from scratch, videos are tracked
+        self.track = not getattr(cap, "still_images", False) if track is None else track
+        if self.track and len(self.models) > 1:
+            raise ValueError("Tracked sources need a single inference thread")
+        # Recorder the analyzed frames also go to, can be set while running
+        self.recorder = recorder
+
+        self.frames = LatestQueue(queue_size, drop=not lossless)
+        self.predictions = LatestQueue(queue_size, drop=not lossless)
+        self.results = LatestQueue(queue_size, drop=not lossless)
+
+        self.running = False
+        self.finished = False
+        self.captured = 0
+        self.delivered = 0
+        # First exception raised by a stage, the pipeline stops on it
+        self.error = None
+        self.threads_ = []
+        # The source is only released once the capture thread is out of read()
+        self.release_lock_ = threading.Lock()
+        self.capturing_ = False
+        self.release_on_exit_ = False
+
+    def start(self):
+        self.running = True
+        self.finished = False
+        self.started_ = time.perf_counter()
+        self.capturing_ = True
+        stages = [(self.capture_loop,)]
+        stages += [(self.inference_loop, model) for model in self.models]
+        stages.append((self.annotate_loop,))
+        self.threads_ = [
+            threading.Thread(target=self.run_stage, args=stage, daemon=True)
+            for stage in stages
+        ]
+        for thread in self.threads_:
+            thread.start()
+
+    def run_stage(self, loop, *args):
+        try:
+            loop(*args)
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+            self.running = False
+            self.finished = True
+            for queue in (self.frames, self.predictions, self.results):
+                queue.close()
+
+    def stop(self):
+        self.running = False
+        for queue in (self.frames, self.predictions, self.results):
+            queue.close()
+        for thread in self.threads_:
+            if thread is not threading.current_thread():
+                thread.join(timeout=1.0)
+        self.threads_ = []
+        if self.cap:
+            with self.release_lock_:
+                if self.capturing_:
+                    # Still inside read() after the timeout, the capture
+                    # thread releases the source once it returns
+                    self.release_on_exit_ = True
+                else:
+                    self.cap.release()
+
+    def get_result(self):
+        # The next FrameResult if one is ready, None otherwise
+        result = self.results.get_nowait()
+        if result is None:
+            return None
+        return self.deliver(result)
+
+    def deliver(self, result):
+        self.delivered += 1
+        # Sources that pace themselves (VideoReader) learn the real latency
+        if hasattr(self.cap, "record_display"):
+            self.cap.record_display(time.perf_counter() - result.read_time)
+        return result
+
+    def stream(self):
+        """
+        Generator of FrameResults until the source is exhausted, starting
+        the pipeline if needed and stopping it when the loop is left.
+        """
+        if not self.running:
+            self.start()
+        try:
+            while not self.is_done():
+                result = self.results.get(timeout=0.1)
+                if result is not None:
+                    yield self.deliver(result)
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.stop()
+
+    def process(self, frame, timestamp_ms=0.0):
+        # All stages inline on the calling thread, e.g. for a single image
+        result = FrameResult(0, timestamp_ms, frame, None, None, time.perf_counter())
+        return self.render(self.infer(result))
+
+    def pacing_stats(self):
+        if hasattr(self.cap, "stats"):
+            return self.cap.stats()
+        return None
+
+    def dropped_frames(self):
+        return {
+            # Frames the source itself skipped, e.g. a realtime VideoReader
+            "source": getattr(self.cap, "dropped", 0),
+            "capture": self.frames.dropped,
+            "inference": self.predictions.dropped,
+            "render": self.results.dropped,
+        }
+
+    def is_done(self):
+        # Source exhausted and every captured frame was handed out or dropped
+        if self.error is not None:
+            return True
+        dropped = self.frames.dropped + self.predictions.dropped + self.results.dropped
+        return self.finished and self.delivered + dropped >= self.captured
+
+    def timestamp_ms(self, read_time):
+        # Sources that prefetch know the time of the frame they handed out
+        if hasattr(self.cap, "position_ms"):
+            return self.cap.position_ms
+        # Cameras have no frame count and report CAP_PROP_POS_MSEC differently
+        # per backend, their frames get the time since capture started
+        if not hasattr(self.cap, "get") or self.cap.get(cv2.CAP_PROP_FRAME_COUNT) <= 0:
+            return (read_time - self.started_) * 1000
+        return self.cap.get(cv2.CAP_PROP_POS_MSEC)
+
+    def capture_loop(self):
+        # Sources with stored results (SidecarPlayer) skip inference entirely
+        analyzed = hasattr(self.cap, "read_analyzed")
+        queue = self.predictions if analyzed else self.frames
+        # Self-pacing sources decide themselves which frames to skip, so they
+        # are only read once the next stage has taken the previous frame
+        paced = hasattr(self.cap, "record_display")
+        try:
+            while self.running:
+                if paced and not queue.wait_empty(timeout=0.1):
+                    continue
+                detections = None
+                with profiler.stage("capture"):
+                    if analyzed:
+                        ret, frame, detections = self.cap.read_analyzed()
+                    else:
+                        ret, frame = self.cap.read()
+                if not ret:
+                    break
+                read_time = time.perf_counter()
+                result = FrameResult(
+                    self.captured,
+                    self.timestamp_ms(read_time),
+                    frame,
+                    detections,
+                    None,
+                    read_time,
+                )
+                self.captured += 1
+                queue.put(result)
+        finally:
+            self.finished = True
+            with self.release_lock_:
+                self.capturing_ = False
+                if self.release_on_exit_:
+                    self.cap.release()
+
+    def infer(self, result, model=None):
+        detections = (model or self.model).analyze(result.frame, track=self.track)
+        return result._replace(detections=detections)
+
+    def render(self, result):
+        if self.annotate is not None:
+            with profiler.stage("annotate"):
+                result = result._replace(view=self.annotate(result.frame, result.detections))
+        # Only after annotate, the recorder draws onto the frame itself
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.submit(result.frame, result.detections, result.timestamp_ms)
+        return result
+
+    def inference_loop(self, model):
+        while self.running:
+            result = self.frames.get(timeout=0.1)
+            if result is None:
+                continue
+            self.predictions.put(self.infer(result, model))
+
+    def annotate_loop(self):
+        while self.running:
+            result = self.predictions.get(timeout=0.1)
+            if result is None:
+                continue
+            self.results.put(self.render(result))
@@ -1,57 +1,126 @@
+import time
+
 import numpy as np
+from Profiler import profiler
 
+EMOTIONS = [
+    "Anger",
+    "Contempt",
+    "Disgust",
+    "Fear",
+    "Happy",
+    "Neutral",
+    "Sad",
+    "Surprise",
+]
 
-class Plot:
-    def __init__(self, maxFrames=100):
-        self.frames_ = [[] for i in range(maxFrames)]
-        self.index_ = 0
-        self.counts_ = {
-            "Anger": [0, 0.0],
-            "Contempt": [0, 0.0],
-            "Disgust": [0, 0.0],
-            "Fear": [0, 0.0],
-            "Happy": [0, 0.0],
-            "Neutral": [0, 0.0],
-            "Sad": [0, 0.0],
-            "Surprise": [0, 0.0],
-        }
+# Confidences are summed as integers in millionths, so subtracting an evicted
+# frame gives back exactly the previous sum and nothing drifts
+CONF_SCALE = 1_000_000
+
+
+class RollingWindow:
+    """
+    Per-class face counts and confidence sums over the last `frames` frames,
+    or over the last `seconds` seconds in buckets of `resolution` seconds.
+    Every slot of the ring keeps its own totals, which are subtracted when
+    the slot is reused.
+    """
+
+    def __init__(self, numClasses, frames=None, seconds=None, resolution=0.1):
+        if frames is not None:
+            self.size_ = frames
+            self.resolution_ = None
+        else:
+            self.size_ = max(1, int(round(seconds / resolution)))
+            self.resolution_ = resolution
+
+        self.slotCounts_ = np.zeros((self.size_, numClasses), dtype=np.int64)
+        self.slotSums_ = np.zeros((self.size_, numClasses), dtype=np.int64)
+        self.counts = np.zeros(numClasses, dtype=np.int64)
+        self.sums_ = np.zeros(numClasses, dtype=np.int64)
+        # frame number or time bucket held by each slot
+        self.position_ = -1
+
+    def evict(self, slot):
+        self.counts -= self.slotCounts_[slot]
+        self.sums_ -= self.slotSums_[slot]
+        self.slotCounts_[slot] = 0
+        self.slotSums_[slot] = 0
 
-    def update(self, emotionsOnFrame):
-        # usuwamy ramke
-        self.removeFrame()
-        # zapisujemy ramke
-        self.addFrame(emotionsOnFrame)
-        # update indexu
-        if self.index_ + 1 >= len(self.frames_):
-            self.index_ = 0
+    def add(self, frameCounts, frameSums, timestamp):
+        if self.resolution_ is None:
+            position = self.position_ + 1
         else:
-            self.index_ += 1
+            position = int(timestamp // self.resolution_)
+
+        if position > self.position_:
+            # Clear every slot we skipped over, at most the whole ring
+            first = max(self.position_ + 1, position - self.size_ + 1)
+            for p in range(first, position + 1):
+                self.evict(p % self.size_)
+            self.position_ = position
+
+        slot = self.position_ % self.size_
+        self.slotCounts_[slot] += frameCounts
+        self.slotSums_[slot] += frameSums
+        self.counts += frameCounts
+        self.sums_ += frameSums
+
+    def means(self):
+        means = np.zeros(len(self.counts), dtype=np.float64)
+        np.divide(self.sums_, self.counts * CONF_SCALE, out=means, where=self.counts > 0)
+        return means
+
+
+class Plot:
+    def __init__(self, maxFrames=100, windowsSeconds=(10, 300), names=EMOTIONS):
+        self.names_ = list(names)
+        self.classIds_ = {name: i for i, name in enumerate(self.names_)}
+        numClasses = len(self.names_)
+
+        # okno po klatkach + okna czasowe
+        self.windows_ = {"frames": RollingWindow(numClasses, frames=maxFrames)}
+        for seconds in windowsSeconds:
+            self.windows_[f"{seconds}s"] = RollingWindow(numClasses, seconds=seconds)
+
+    def update(self, emotionsOnFrame, timestamp=None):
+        # emotionsOnFrame: lista [emocja, pewnosc] dla kazdej twarzy
+        classIds = np.array(
+            [self.classIds_[box[0]] for box in emotionsOnFrame], dtype=np.int64
+        )
+        confidences = np.array([box[1] for box in emotionsOnFrame], dtype=np.float64)
+        return self.updateArrays(classIds, confidences, timestamp)
+
+    def updateArrays(self, classIds, confidences, timestamp=None):
+        # wektorowo, prosto z wyjscia modelu
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with profiler.stage("plot"):
+            numClasses = len(self.names_)
+            classIds = np.asarray(classIds, dtype=np.int64)
+            fixed = np.rint(np.asarray(confidences, dtype=np.float64) * CONF_SCALE)
+
+            frameCounts = np.bincount(classIds, minlength=numClasses)
+            frameSums = np.bincount(
+                classIds, weights=fixed, minlength=numClasses
+            ).astype(np.int64)
+            for window in self.windows_.values():
+                window.add(frameCounts, frameSums, timestamp)
         # wysyłamy dane na wykres
-        return self.counts_
-
-    def removeFrame(self):
-        currentFrame = self.frames_[self.index_]
-        if len(currentFrame) > 0:
-            for box in currentFrame:
-                if self.counts_[box[0]][1] * self.counts_[box[0]][0] - box[1] < 0:
-                    self.counts_[box[0]][1] = 0.0
-                elif self.counts_[box[0]][0] - 1 <= 0:
-                    self.counts_[box[0]][1] = 0.0
-                else:
-                    self.counts_[box[0]][1] = (
-                        self.counts_[box[0]][1] * self.counts_[box[0]][0] - box[1]
-                    ) / (self.counts_[box[0]][0] - 1)
-
-                if self.counts_[box[0]][0] - 1 < 0:
-                    self.counts_[box[0]][0] = 0
-                else:
-                    self.counts_[box[0]][0] -= 1
-
-    def addFrame(self, emotionsOnFrame):
-        if len(emotionsOnFrame) > 0:
-            for box in emotionsOnFrame:
-                self.counts_[box[0]][1] = (
-                    self.counts_[box[0]][1] * self.counts_[box[0]][0] + box[1]
-                ) / (self.counts_[box[0]][0] + 1)
-                self.counts_[box[0]][0] += 1
-        self.frames_[self.index_] = emotionsOnFrame
+        return self.counts()
+
+    def windows(self):
+        return list(self.windows_)
+
+    def stats(self, window="frames"):
+        # (liczby, srednie pewnosci) jako tablice indeksowane id klasy
+        rolling = self.windows_[window]
+        return rolling.counts.copy(), rolling.means()
+
+    def counts(self, window="frames"):
+        counts, means = self.stats(window)
+        return {
+            name: [int(count), float(mean)]
+            for name, count, mean in zip(self.names_, counts, means)
+        }
@@ -0,0 +1,187 @@
+import contextlib
+import json
+import threading
+import time
+
+import numpy as np
+
+NULL_SPAN = contextlib.nullcontext()
+
+
+class StageBuffer:
+    # Fixed-size ring of the last `capacity` timings of one stage
+    def __init__(self, capacity):
+        self.starts = np.zeros(capacity, dtype=np.float64)
+        self.durations = np.zeros(capacity, dtype=np.float64)
+        self.threads = np.zeros(capacity, dtype=np.int64)
+        self.index = 0
+        self.count = 0
+
+    def add(self, start, duration, thread_id):
+        i = self.index
+        self.starts[i] = start
+        self.durations[i] = duration
+        self.threads[i] = thread_id
+        self.index = (i + 1) % len(self.starts)
+        self.count = min(self.count + 1, len(self.starts))
+
+    def ordered(self):
+        # Oldest to newest
+        if self.count < len(self.starts):
+            order = np.arange(self.count)
+        else:
+            order = np.roll(np.arange(len(self.starts)), -self.index)
+        return self.starts[order], self.durations[order], self.threads[order]
+
+
+class Span:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Per-stage hot-path timings. Code marks stages with
+    `with profiler.stage("detect"): ...`; while disabled that returns a shared
+    no-op context, so instrumentation can stay in place for good.
+    """
+
+    def __init__(self, capacity=2048, enabled=False):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.stages_ = {}
+        self.lock_ = threading.Lock()
+        self.origin_ = time.perf_counter()
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def record(self, name, start, duration):
+        with self.lock_:
+            buffer = self.stages_.get(name)
+            if buffer is None:
+                buffer = self.stages_[name] = StageBuffer(self.capacity)
+            buffer.add(start - self.origin_, duration, threading.get_ident())
+
+    def reset(self):
+        with self.lock_:
+            self.stages_ = {}
+            self.origin_ = time.perf_counter()
+
+    def snapshot(self):
+        with self.lock_:
+            return {name: buffer.ordered() for name, buffer in self.stages_.items()}
+
+    def summary(self, window=None):
+        """
+        {stage: {count, p50_ms, p95_ms, p99_ms, rate}} over the last `window`
+        seconds (everything in the ring buffers if None). rate is calls per
+        second, for the stage marking a shown frame that is the FPS.
+        """
+        now = time.perf_counter() - self.origin_
+        summary = {}
+        for name, (starts, durations, _) in self.snapshot().items():
+            if window is not None:
+                recent = starts >= now - window
+                starts, durations = starts[recent], durations[recent]
+            if len(durations) == 0:
+                continue
+            p50, p95, p99 = np.percentile(durations * 1000, [50, 95, 99])
+            span = starts[-1] - starts[0]
+            summary[name] = {
+                "count": len(durations),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "rate": (len(starts) - 1) / span if span > 0 else 0.0,
+            }
+        return summary
+
+    def export_chrome_trace(self, path):
+        # Load in chrome://tracing or https://ui.perfetto.dev
+        events = []
+        for name, (starts, durations, threads) in self.snapshot().items():
+            for start, duration, thread_id in zip(starts, durations, threads):
+                events.append(
+                    {
+                        "name": name,
+                        "ph": "X",
+                        "ts": start * 1e6,
+                        "dur": duration * 1e6,
+                        "pid": 1,
+                        "tid": int(thread_id),
+                    }
+                )
+        events.sort(key=lambda event: event["ts"])
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export_csv(self, path):
+        rows = []
+        for name, (starts, durations, threads) in self.snapshot().items():
+            for start, duration, thread_id in zip(starts, durations, threads):
+                rows.append((start, name, duration, thread_id))
+        rows.sort()
+        with open(path, "w") as f:
+            f.write("start_s,stage,duration_ms,thread\n")
+            for start, name, duration, thread_id in rows:
+                f.write(f"{start:.6f},{name},{duration * 1000:.4f},{thread_id}\n")
+
+
+class StartupTimer:
+    """
+    Durations of one-off startup stages, which may run on different
+    threads, together with their offset from the start of the process.
+    """
+
+    def __init__(self):
+        try:
+            import psutil
+
+            age = time.time() - psutil.Process().create_time()
+        except ImportError:
+            age = 0.0
+        self.origin = time.perf_counter() - age
+        self.stages = []
+        self.lock_ = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.lock_:
+                self.stages.append((name, start - self.origin, end - start))
+
+    def mark(self, name):
+        # A point in time rather than a stage, e.g. the first paint
+        with self.lock_:
+            self.stages.append((name, self.elapsed(), 0.0))
+
+    def elapsed(self):
+        return time.perf_counter() - self.origin
+
+    def report(self):
+        with self.lock_:
+            stages = sorted(self.stages, key=lambda stage: stage[1])
+        return " | ".join(
+            f"{name} {duration:.2f} s (at {offset:.2f} s)"
+            for name, offset, duration in stages
+        )
+
+
+# Shared by the app, the recognition layer and the plot
+profiler = Profiler()
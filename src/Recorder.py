@@ -0,0 +1,195 @@
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from FaceRecognition import draw_detections
+
+
+class Recorder:
+    """
+    Saves annotated frames to video files without blocking the caller.
+    submit() only puts the frame into a bounded queue; a writer thread draws
+    the detections and encodes. When encoding falls behind and the queue is
+    full, new frames are dropped and counted instead of piling up.
+
+    Frames arrive at whatever rate inference manages, the file is written at
+    a constant `fps`: every frame is placed by its timestamp, gaps repeat the
+    previous frame and frames that come faster than `fps` are skipped. So
+    the recording plays at real speed. It is split into segments of
+    `segment_seconds` of stream time or `segment_mb`, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        directory="recordings",
+        fps=30.0,
+        codec="mp4v",
+        extension=".mp4",
+        queue_size=64,
+        segment_seconds=600,
+        segment_mb=None,
+        max_gap_ms=1000,
+    ):
+        self.directory = directory
+        self.fps = fps
+        self.fourcc = cv2.VideoWriter_fourcc(*codec)
+        self.extension = extension
+        self.segment_ms = segment_seconds * 1000 if segment_seconds else None
+        self.segment_bytes = segment_mb * 2**20 if segment_mb else None
+        # Timestamps jumping back or further ahead than this (a seek, a
+        # paused source) continue the video where it is instead of filling it
+        self.max_gap_ms = max_gap_ms
+
+        self.frames_ = queue.Queue(maxsize=queue_size)
+        self.thread_ = None
+        self.writer_ = None
+        self.size_ = None
+        self.segment_written_ = 0
+        self.next_size_check_ = 0
+        # Timestamp of the first frame of the segment and of the last frame
+        self.start_ms_ = None
+        self.last_ms_ = None
+        self.last_frame_ = None
+        self.prefix_ = None
+
+        self.segments = []
+        self.written = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.skipped = 0
+        # Set if the writer thread failed, e.g. the codec is not available
+        self.error = None
+
+    @property
+    def recording(self):
+        return self.thread_ is not None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("rec_%Y%m%d_%H%M%S")
+        self.prefix_ = os.path.join(self.directory, stamp)
+        # Never overwrite a recording started within the same second
+        attempt = 1
+        while os.path.exists(f"{self.prefix_}_000{self.extension}"):
+            self.prefix_ = os.path.join(self.directory, f"{stamp}-{attempt}")
+            attempt += 1
+        self.thread_ = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread_.start()
+
+    def submit(self, frame, detections=(), timestamp_ms=None):
+        """
+        Queues a BGR frame with the detections to draw on it and the stream
+        time it was captured at, the time of submit() if not given. The
+        frame is drawn on later, the caller must not reuse it. Returns False
+        if it was dropped.
+        """
+        if self.thread_ is None or self.error is not None:
+            return False
+        if timestamp_ms is None:
+            timestamp_ms = time.perf_counter() * 1000
+        try:
+            self.frames_.put_nowait((frame, detections, timestamp_ms))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stop(self, timeout=5.0):
+        # Frames already queued are still written
+        if self.thread_ is None:
+            return
+        if self.thread_.is_alive():
+            try:
+                self.frames_.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self.thread_.join(timeout=timeout)
+        self.thread_ = None
+
+    def stats(self):
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "duplicated": self.duplicated,
+            "skipped": self.skipped,
+            "queued": self.frames_.qsize(),
+            "segments": len(self.segments),
+            "error": str(self.error) if self.error else None,
+        }
+
+    def slot_for(self, timestamp_ms):
+        # Frame number in the segment a frame of this timestamp belongs at
+        if (
+            self.last_ms_ is None
+            or timestamp_ms < self.last_ms_
+            or timestamp_ms - self.last_ms_ > self.max_gap_ms
+        ):
+            self.start_ms_ = timestamp_ms - self.segment_written_ * 1000 / self.fps
+        self.last_ms_ = timestamp_ms
+        return round((timestamp_ms - self.start_ms_) * self.fps / 1000)
+
+    def segment_full(self, timestamp_ms):
+        if self.segment_ms and timestamp_ms - self.start_ms_ >= self.segment_ms:
+            return True
+        # The file size only every second of video, it needs a stat call
+        if self.segment_bytes and self.segment_written_ >= self.next_size_check_:
+            self.next_size_check_ = self.segment_written_ + max(1, int(self.fps))
+            return os.path.getsize(self.segments[-1]) >= self.segment_bytes
+        return False
+
+    def open_segment(self, size, timestamp_ms):
+        self.close_segment()
+        path = f"{self.prefix_}_{len(self.segments):03d}{self.extension}"
+        self.writer_ = cv2.VideoWriter(path, self.fourcc, self.fps, size)
+        if not self.writer_.isOpened():
+            raise RuntimeError(f"Could not open {path} for writing")
+        self.size_ = size
+        self.segment_written_ = 0
+        self.next_size_check_ = 0
+        self.start_ms_ = timestamp_ms
+        self.last_ms_ = timestamp_ms
+        self.last_frame_ = None
+        self.segments.append(path)
+
+    def close_segment(self):
+        if self.writer_ is not None:
+            self.writer_.release()
+            self.writer_ = None
+
+    def write_loop(self):
+        try:
+            while True:
+                item = self.frames_.get()
+                if item is None:
+                    break
+                frame, detections, timestamp_ms = item
+                size = (frame.shape[1], frame.shape[0])
+                # A new source with another size starts a new segment too
+                if self.writer_ is None or size != self.size_:
+                    self.open_segment(size, timestamp_ms)
+                slot = self.slot_for(timestamp_ms)
+                if self.segment_full(timestamp_ms):
+                    self.open_segment(size, timestamp_ms)
+                    slot = 0
+                if slot < self.segment_written_:
+                    # Faster than fps, the previous frame already fills the slot
+                    self.skipped += 1
+                    continue
+
+                # Until this frame the previous one stays on screen
+                while self.segment_written_ < slot:
+                    self.writer_.write(self.last_frame_)
+                    self.segment_written_ += 1
+                    self.duplicated += 1
+                draw_detections(frame, detections)
+                self.writer_.write(frame)
+                self.last_frame_ = frame
+                self.segment_written_ += 1
+                self.written += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self.close_segment()
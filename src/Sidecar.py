@@ -0,0 +1,348 @@
+import json
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+import polars as pl
+
+from FaceRecognition import Detection
+from FramePacer import FramePacer
+from Pipeline import Pipeline
+from VideoReader import VideoReader
+
+# One row per video frame, the faces of the frame as list columns
+SCHEMA = {
+    "frame": pl.Int64,
+    "timestamp_ms": pl.Float64,
+    "track_ids": pl.List(pl.Int32),
+    "boxes": pl.List(pl.Array(pl.Int32, 4)),
+    "classes": pl.List(pl.Int8),
+    "confidences": pl.List(pl.Float32),
+}
+
+
+def sidecar_path(video_path):
+    return video_path + ".emotions.parquet"
+
+
+def info_path_for(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def video_fingerprint(video_path):
+    # A re-encoded or replaced video changes size or mtime
+    stat = os.stat(video_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def write_sidecar(video_path, model, target_width=640, progress=None):
+    """
+    Analyzes the whole video once with a FaceRecognition model and stores
+    the detections of every frame next to it. Frames are downscaled to
+    target_width by the same VideoReader playback uses, so the boxes match
+    the frames shown. progress(frame, total) is called every 30 frames.
+    """
+    source = VideoReader(video_path, target_width=target_width)
+    if not source.isOpened():
+        raise ValueError(f"Could not open {video_path}")
+    total = int(source.get(cv2.CAP_PROP_FRAME_COUNT))
+    # Every frame in order, none may be dropped
+    pipeline = Pipeline(source, model, queue_size=8, lossless=True)
+
+    names = model.model.names
+    class_ids = {name: cls_id for cls_id, name in names.items()}
+    rows = {column: [] for column in SCHEMA}
+
+    model.reset()
+    for result in pipeline.stream():
+        detections = result.detections
+        rows["frame"].append(result.index)
+        rows["timestamp_ms"].append(result.timestamp_ms)
+        rows["track_ids"].append([d.track_id for d in detections])
+        rows["boxes"].append([list(d.box) for d in detections])
+        rows["classes"].append([class_ids[d.emotion] for d in detections])
+        rows["confidences"].append([d.conf for d in detections])
+
+        if progress is not None and (result.index + 1) % 30 == 0:
+            progress(result.index + 1, total)
+
+    # Written under temporary names first, a present sidecar is complete
+    path = sidecar_path(video_path)
+    pl.DataFrame(rows, schema=SCHEMA).write_parquet(path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+    info_path = info_path_for(path)
+    with open(info_path + ".tmp", "w") as f:
+        json.dump(
+            {
+                "fingerprint": video_fingerprint(video_path),
+                "fps": source.fps,
+                "frame_size": [source.width, source.height],
+                "frames": len(rows["frame"]),
+                "names": [names[i] for i in sorted(names)],
+            },
+            f,
+            indent=2,
+        )
+    os.replace(info_path + ".tmp", info_path)
+    return path
+
+
+def load_sidecar(video_path):
+    # The stored analysis, None if there is none or the video changed
+    path = sidecar_path(video_path)
+    info_path = info_path_for(path)
+    if not (os.path.exists(path) and os.path.exists(info_path)):
+        return None
+    with open(info_path) as f:
+        info = json.load(f)
+    if info.get("fingerprint") != video_fingerprint(video_path):
+        return None
+    return Sidecar(path, info)
+
+
+def flat(column, dtype):
+    # All faces of all frames as one array, in frame order
+    return column.explode().drop_nulls().to_numpy().astype(dtype, copy=False)
+
+
+class Sidecar:
+    """
+    Detections of a whole video held as flat numpy arrays. The faces of
+    frame i are rows offsets[i]:offsets[i + 1], and the timestamps are the
+    seek index: any playback time maps to its frame with one binary search.
+    """
+
+    def __init__(self, path, info):
+        df = pl.read_parquet(path)
+        self.fps = info["fps"]
+        self.frame_size = tuple(info["frame_size"])
+        self.names = info["names"]
+
+        self.timestamps = df["timestamp_ms"].to_numpy()
+        self.offsets = np.zeros(df.height + 1, dtype=np.int64)
+        np.cumsum(df["classes"].list.len().to_numpy(), out=self.offsets[1:])
+        self.track_ids = flat(df["track_ids"], np.int32)
+        self.boxes = flat(df["boxes"], np.int32).reshape(-1, 4)
+        self.classes = flat(df["classes"], np.int64)
+        self.confidences = flat(df["confidences"], np.float32)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def duration_ms(self):
+        return float(self.timestamps[-1]) if len(self) else 0.0
+
+    def frame_at(self, timestamp_ms):
+        # Last frame shown at or before timestamp_ms
+        frame = np.searchsorted(self.timestamps, timestamp_ms, side="right") - 1
+        return int(np.clip(frame, 0, max(len(self) - 1, 0)))
+
+    def frame_arrays(self, frame):
+        # (class ids, confidences) of one frame, as Plot.updateArrays takes them
+        start, stop = self.offsets[frame], self.offsets[frame + 1]
+        return self.classes[start:stop], self.confidences[start:stop]
+
+    def detections(self, frame):
+        if not 0 <= frame < len(self):
+            return []
+        start, stop = self.offsets[frame], self.offsets[frame + 1]
+        return [
+            Detection(
+                int(self.track_ids[i]),
+                tuple(int(v) for v in self.boxes[i]),
+                self.names[self.classes[i]],
+                float(self.confidences[i]),
+            )
+            for i in range(start, stop)
+        ]
+
+    def counts(self, start_ms, end_ms):
+        """
+        Faces per emotion and their mean confidence over [start_ms, end_ms),
+        in the {name: [count, mean]} format of Plot.counts.
+        """
+        first, last = np.searchsorted(self.timestamps, [start_ms, end_ms])
+        start, stop = self.offsets[first], self.offsets[last]
+        classes = self.classes[start:stop]
+        counts = np.bincount(classes, minlength=len(self.names))
+        sums = np.bincount(
+            classes, weights=self.confidences[start:stop], minlength=len(self.names)
+        )
+        means = np.divide(sums, counts, out=np.zeros(len(counts)), where=counts > 0)
+        return {
+            name: [int(count), float(mean)]
+            for name, count, mean in zip(self.names, counts, means)
+        }
+
+
+class SidecarPlayer:
+    """
+    Plays a video together with its sidecar, no inference at all. Frames are
+    prefetched and paced like VideoReader, and read_analyzed() hands out the
+    stored detections with each one. seek() jumps to any time and speed > 1
+    fast-forwards: the pacer simply drops the frames there is no time for.
+    """
+
+    def __init__(self, path, sidecar, buffer_size=8):
+        self.cap = cv2.VideoCapture(path)
+        self.sidecar = sidecar
+        self.fps = sidecar.fps
+        self.pacer = FramePacer(frame_duration_ms=1000 / self.fps)
+        self.speed = 1.0
+        self.position_ms = 0.0
+
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # Frames get the size they had during the analysis
+        self.size = sidecar.frame_size if sidecar.frame_size != (width, height) else None
+        self.width, self.height = sidecar.frame_size
+
+        self.frames_ = queue.Queue(maxsize=buffer_size)
+        self.lock_ = threading.Lock()
+        # Bumped by every seek, frames prefetched before it are stale
+        self.generation_ = 0
+        self.seek_to_ = None
+        self.running = self.cap.isOpened()
+        # As in VideoReader, the prefetch thread closes self.cap if release()
+        # comes while it still uses it
+        self.prefetching_ = self.running
+        self.release_on_exit_ = False
+
+        self.thread_ = threading.Thread(target=self.prefetch_loop, daemon=True)
+        if self.running:
+            self.thread_.start()
+
+    @property
+    def dropped(self):
+        return self.pacer.dropped
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        return self.cap.get(prop)
+
+    def duration_ms(self):
+        return self.sidecar.duration_ms()
+
+    def seek(self, timestamp_ms):
+        with self.lock_:
+            self.seek_to_ = self.sidecar.frame_at(timestamp_ms)
+            self.generation_ += 1
+            self.position_ms = float(self.sidecar.timestamps[self.seek_to_])
+        # Unblocks the prefetch thread if it waits on a full queue
+        while True:
+            try:
+                self.frames_.get_nowait()
+            except queue.Empty:
+                break
+
+    def set_speed(self, speed):
+        with self.lock_:
+            self.speed = speed
+            self.pacer.restart()
+
+    def playback_ms(self, pts_ms):
+        # Stream time the pacer sees, compressed by the playback speed
+        return pts_ms / self.speed
+
+    def is_late(self, pts_ms):
+        return self.pacer.started() and self.pacer.is_late(self.playback_ms(pts_ms))
+
+    def prefetch_loop(self):
+        while self.running:
+            with self.lock_:
+                target, self.seek_to_ = self.seek_to_, None
+                generation = self.generation_
+            if target is not None:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                self.pacer.restart()
+
+            frame_index = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+            if not self.cap.grab():
+                break
+            if frame_index < len(self.sidecar):
+                pts_ms = float(self.sidecar.timestamps[frame_index])
+            else:
+                pts_ms = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            if self.is_late(pts_ms):
+                self.pacer.skip()
+                continue
+
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                break
+            if self.size is not None:
+                frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+
+            item = (generation, frame_index, pts_ms, frame)
+            while self.running and generation == self.generation_:
+                try:
+                    self.frames_.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+        self.running = False
+        with self.lock_:
+            self.prefetching_ = False
+            if self.release_on_exit_:
+                self.cap.release()
+        try:
+            self.frames_.put(None, timeout=0.1)
+        except queue.Full:
+            pass
+
+    def read_analyzed(self):
+        # (ret, frame, detections), the detections as FaceRecognition gives them
+        while True:
+            try:
+                item = self.frames_.get(timeout=0.1)
+            except queue.Empty:
+                if not self.running and self.frames_.empty():
+                    return False, None, None
+                continue
+            if item is None:
+                return False, None, None
+
+            generation, frame_index, pts_ms, frame = item
+            if generation != self.generation_:
+                continue
+            if self.pacer.is_late(self.playback_ms(pts_ms)):
+                self.pacer.skip()
+                continue
+            self.pacer.wait(self.playback_ms(pts_ms))
+            self.position_ms = pts_ms
+            return True, frame, self.sidecar.detections(frame_index)
+
+    def read(self):
+        ret, frame, _ = self.read_analyzed()
+        return ret, frame
+
+    def record_display(self, latency):
+        self.pacer.record_latency(latency)
+        self.pacer.mark_shown()
+
+    def stats(self):
+        return self.pacer.stats()
+
+    def grab(self):
+        ret, _ = self.read()
+        return ret
+
+    def release(self):
+        self.running = False
+        if self.thread_.is_alive():
+            self.thread_.join(timeout=1.0)
+        with self.lock_:
+            if self.prefetching_:
+                self.release_on_exit_ = True
+            else:
+                self.cap.release()
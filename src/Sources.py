@@ -0,0 +1,80 @@
+import os
+
+import cv2
+
+from VideoReader import VideoReader
+
+VIDEO_EXTENSIONS = [".mp4", ".avi", ".mov", ".mkv"]
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png"]
+
+
+class ImageSource:
+    """
+    Still images read one after another, from a list of files or a
+    directory. Pipelines analyze them without tracking, every image on its
+    own. Mimics the parts of cv2.VideoCapture the pipeline uses.
+    """
+
+    still_images = True
+
+    def __init__(self, paths):
+        if isinstance(paths, str):
+            paths = [paths]
+        self.paths = []
+        for path in paths:
+            if os.path.isdir(path):
+                self.paths += [
+                    os.path.join(path, name)
+                    for name in sorted(os.listdir(path))
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+                ]
+            else:
+                self.paths.append(path)
+        self.next_ = 0
+        # (position in paths, path) of every image read() returned, so the
+        # index of a FrameResult leads back to its file
+        self.returned = []
+        self.position_ms = 0.0
+        self.skipped = []
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        # Unreadable files are skipped and remembered
+        while self.next_ < len(self.paths):
+            position, path = self.next_, self.paths[self.next_]
+            self.next_ += 1
+            image = cv2.imread(path)
+            if image is not None:
+                self.returned.append((position, path))
+                return True, image
+            self.skipped.append(path)
+        return False, None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return len(self.paths)
+        return 0.0
+
+    def release(self):
+        self.next_ = len(self.paths)
+
+
+def open_source(spec, target_width=640, realtime=False, start_frame=0):
+    """
+    Source for a Pipeline from a camera index ("0", 1), a video file, an
+    image file or a directory of images. Videos are streamed through a
+    VideoReader, realtime=True drops late frames for live playback.
+    """
+    if isinstance(spec, int) or str(spec).isdigit():
+        return cv2.VideoCapture(int(spec))
+
+    ext = os.path.splitext(spec)[1].lower()
+    if os.path.isdir(spec) or ext in IMAGE_EXTENSIONS:
+        return ImageSource(spec)
+    if ext in VIDEO_EXTENSIONS:
+        return VideoReader(
+            spec, target_width=target_width, realtime=realtime, start_frame=start_frame
+        )
+    raise ValueError(f"Unsupported source: {spec}")
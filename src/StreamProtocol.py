@@ -0,0 +1,61 @@
+"""
+Messages between InferenceServer and its clients, both directions:
+4 byte big-endian length of a JSON header, the header, then
+header["size"] bytes of payload (JPEG images, may be empty).
+
+Client -> server
+    {"type": "hello", "stream": "cam1"}
+    {"type": "frame", "seq": 7, "size": n}                  JPEG of a frame
+    {"type": "crops", "seq": 7, "size": n, "sizes": [...]}  JPEG face crops
+    {"type": "metrics"}
+Server -> client
+    {"seq": 7, "status": "ok", "faces": [...], "latency_ms": 12.3}
+    {"seq": 6, "status": "dropped"}   replaced by a newer frame of the stream
+    {"type": "metrics", ...}
+"""
+
+import json
+import struct
+
+import cv2
+import numpy as np
+
+HEADER = struct.Struct(">I")
+
+
+async def read_message(reader):
+    # None once the other side closed the connection
+    try:
+        (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+        header = json.loads(await reader.readexactly(length))
+        payload = await reader.readexactly(header.get("size", 0))
+    except (ConnectionError, EOFError, OSError):
+        return None
+    return header, payload
+
+
+async def write_message(writer, header, payload=b""):
+    header = dict(header, size=len(payload))
+    data = json.dumps(header).encode()
+    writer.write(HEADER.pack(len(data)) + data + payload)
+    await writer.drain()
+
+
+def encode_image(image, quality=90):
+    ok, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode image")
+    return data.tobytes()
+
+
+def decode_image(data):
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def split_crops(payload, sizes):
+    crops = []
+    offset = 0
+    for size in sizes:
+        crops.append(decode_image(payload[offset : offset + size]))
+        offset += size
+    return crops
@@ -0,0 +1,144 @@
+import queue
+import threading
+
+import cv2
+from FramePacer import FramePacer
+
+
+def scaled_size(width, height, target_width):
+    # Only downscale, never upscale small videos. None keeps the frame as is.
+    if target_width is not None and width > target_width:
+        return (target_width, int(height * target_width / width))
+    return None
+
+
+class VideoReader:
+    """
+    Streams a video file through a prefetch thread that downscales frames to
+    target_width on the fly, so playback starts immediately without writing a
+    temporary copy. With realtime=True a FramePacer drops exactly the frames
+    that could not be shown on time any more and holds back early ones.
+    Mimics the parts of cv2.VideoCapture the app uses.
+    """
+
+    def __init__(
+        self, path, target_width=640, realtime=False, buffer_size=8, start_frame=0
+    ):
+        self.cap = cv2.VideoCapture(path)
+        if start_frame:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        self.realtime = realtime
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.pacer = FramePacer(frame_duration_ms=1000 / self.fps)
+
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.size = scaled_size(width, height, target_width)
+        self.width, self.height = self.size or (width, height)
+
+        self.frames_ = queue.Queue(maxsize=buffer_size)
+        self.running = self.cap.isOpened()
+        # Timestamp of the frame read() returned last
+        self.position_ms = 0.0
+        # The prefetch thread owns self.cap while it runs, release() leaves
+        # closing it to the thread if it is still busy
+        self.release_lock_ = threading.Lock()
+        self.prefetching_ = self.running
+        self.release_on_exit_ = False
+
+        self.thread_ = threading.Thread(target=self.prefetch_loop, daemon=True)
+        if self.running:
+            self.thread_.start()
+
+    @property
+    def dropped(self):
+        return self.pacer.dropped
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        return self.cap.get(prop)
+
+    def is_late(self, pts_ms):
+        # The pacer clock starts with the first frame handed to the consumer
+        return self.realtime and self.pacer.started() and self.pacer.is_late(pts_ms)
+
+    def prefetch_loop(self):
+        while self.running:
+            if not self.cap.grab():
+                break
+            pts_ms = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            if self.is_late(pts_ms):
+                # Skips the colour conversion and resize entirely
+                self.pacer.skip()
+                continue
+
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                break
+            if self.size is not None:
+                frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+
+            while self.running:
+                try:
+                    self.frames_.put((pts_ms, frame), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+        self.running = False
+        with self.release_lock_:
+            self.prefetching_ = False
+            if self.release_on_exit_:
+                self.cap.release()
+        try:
+            self.frames_.put(None, timeout=0.1)
+        except queue.Full:
+            pass
+
+    def read(self):
+        while True:
+            try:
+                item = self.frames_.get(timeout=0.1)
+            except queue.Empty:
+                if not self.running and self.frames_.empty():
+                    return False, None
+                continue
+            if item is None:
+                return False, None
+
+            pts_ms, frame = item
+            if self.realtime:
+                if self.pacer.is_late(pts_ms):
+                    self.pacer.skip()
+                    continue
+                self.pacer.wait(pts_ms)
+            self.position_ms = pts_ms
+            return True, frame
+
+    def record_display(self, latency):
+        # Called by the pipeline once a frame read from here is on screen
+        self.pacer.record_latency(latency)
+        self.pacer.mark_shown()
+
+    def stats(self):
+        return self.pacer.stats()
+
+    def grab(self):
+        ret, _ = self.read()
+        return ret
+
+    def release(self):
+        self.running = False
+        if self.thread_.is_alive():
+            self.thread_.join(timeout=1.0)
+        with self.release_lock_:
+            if self.prefetching_:
+                self.release_on_exit_ = True
+            else:
+                self.cap.release()
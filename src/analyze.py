@@ -0,0 +1,38 @@
+import argparse
+import time
+
+from FaceRecognition import FaceRecognition
+from Sidecar import load_sidecar, write_sidecar
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Analyze videos once, the app then plays them back from the sidecar"
+    )
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument(
+        "--weights", default="./results/yolo11x_training_epochs300_128/weights/best.pt"
+    )
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--width", type=int, default=640, help="as the app plays it")
+    parser.add_argument("--force", action="store_true", help="redo existing sidecars")
+    args = parser.parse_args()
+
+    model = FaceRecognition(args.weights, device=args.device)
+    for video in args.videos:
+        if not args.force and load_sidecar(video) is not None:
+            print(f"Skipping {video}, already analyzed")
+            continue
+
+        start = time.perf_counter()
+        path = write_sidecar(
+            video,
+            model,
+            target_width=args.width,
+            progress=lambda frame, total: print(f"\r{video}: {frame}/{total}", end=""),
+        )
+        seconds = time.perf_counter() - start
+
+        sidecar = load_sidecar(video)
+        print(f"\r{video}: {len(sidecar)} frames in {seconds:.1f}s -> {path}")
+        summary = sidecar.counts(0, sidecar.duration_ms() + 1)
+        print("  " + ", ".join(f"{name} {count}" for name, (count, _) in summary.items()))
@@ -1,53 +1,181 @@
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
-import customtkinter as ctk
-import cv2
-from PIL import Image
-from FaceRecognition import FaceRecognition
-from Plot import Plot
-from tkinter import filedialog, messagebox
-import os
+import time
+
+from Profiler import StartupTimer, profiler
+
+# Started before anything heavy is imported, see App.report_startup
+startup = StartupTimer()
+
+# Only what the window needs is imported up front. cv2, matplotlib and the
+# model stack (torch/ultralytics) are imported once the window is shown.
+with startup.stage("ui imports"):
+    import customtkinter as ctk
+    from History import EmotionHistory
+    from Plot import EMOTIONS, Plot
+    from tkinter import filedialog, messagebox
+    import tkinter as tk
+    import os
+    import threading
+
+MODEL_PATH = "./results/yolo11x_training_epochs300_128/weights/best.pt"
+MODEL_TASK = "detect"
+# With a per-frame budget the most accurate checkpoint of MODEL_TASK that
+# select_model.py measured to fit it on this machine is used instead of
+# MODEL_PATH. The budget is for the emotion model, face detection comes on top.
+MODEL_REPORT = "./results/model_report.json"
+FRAME_BUDGET_MS = None
+BUDGET_FACES = 1
 
 
 class App(ctk.CTk):
     def __init__(self):
-        super().__init__()
+        with startup.stage("window"):
+            super().__init__()
+
+            self.FRAMES_TO_REMEMBER = 30
+            # Chart ranges in seconds answered by the history
+            self.CHART_RANGES = {"Live": None, "10 min": 600, "1 h": 3600, "Session": 0}
+            # Chart redraws per second, independent of the video frame rate
+            self.CHART_FPS = 10
+
+            # Created once the window is on screen / the model is loaded
+            self.chart = None
+            self.surface = None
+            self.model = None
+            self.loaded_model = None
+            self.model_error = None
+            # Last action requested while the model was still loading
+            self.pending_action = None
+
+            self.init_window()
+            self.protocol("WM_DELETE_WINDOW", self.on_close)
+            # Only one poll callback is ever scheduled at a time
+            self.after_id = None
+
+            self.plot = Plot(self.FRAMES_TO_REMEMBER)
+            # Everything shown this session, kept across reset_plot
+            self.history = EmotionHistory(
+                os.path.join("history", time.strftime("session_%Y%m%d_%H%M%S.bin"))
+            )
+            # Seconds the chart covers from the history, None for the live frames
+            self.chart_range = None
 
-        self.FRAMES_TO_REMEMBER = 30
+            self.cap = None
+            self.pipeline = None
+            self.is_running = False
+            # Sidecar of the video being played back, None for live analysis
+            self.sidecar = None
+            self.analyzer = None
+            self.recorder = None
 
-        self.init_window()
-        self.protocol("WM_DELETE_WINDOW", self.on_close)
-        self.after_ids = []
+        self.after_idle(self.on_first_paint)
 
-        self.model = FaceRecognition(
-            "./results/yolo11x_training_epochs300_128/weights/best.pt"
+    # ============================================================
+    # STARTUP
+    # ============================================================
+    def on_first_paint(self):
+        self.update_idletasks()
+        startup.mark("first paint")
+
+        self.loader = threading.Thread(target=self.load_model, daemon=True)
+        self.loader.start()
+        with startup.stage("chart"):
+            self.create_bar_chart()
+        self.after(100, self.check_model)
+
+    def load_model(self):
+        # Worker thread, must not touch any widget
+        try:
+            with startup.stage("model imports"):
+                from EmotionBackend import load_backend, preferred_artifact
+                from FaceRecognition import FaceRecognition
+            model_path = self.choose_model()
+            with startup.stage("model load"):
+                backend = load_backend(preferred_artifact(model_path))
+            with startup.stage("warmup"):
+                backend.warmup()
+            self.loaded_model = FaceRecognition(model_path, backend=backend)
+        except Exception as e:
+            self.model_error = e
+
+    def choose_model(self):
+        # Worker thread. MODEL_PATH unless a budget and a report for this
+        # machine exist.
+        if FRAME_BUDGET_MS is None:
+            return MODEL_PATH
+        from ModelSelection import latency_ms, load_report, select_model
+
+        report = load_report(MODEL_REPORT)
+        if report is None or BUDGET_FACES not in report["batch_sizes"]:
+            print(f"No model report for this machine, using {MODEL_PATH}")
+            return MODEL_PATH
+        entry = select_model(report, FRAME_BUDGET_MS, MODEL_TASK, BUDGET_FACES)
+        if entry is None:
+            print(f"No {MODEL_TASK} checkpoint in the model report, using {MODEL_PATH}")
+            return MODEL_PATH
+        print(
+            f"Model for {FRAME_BUDGET_MS} ms: {entry['weights']}"
+            f" ({latency_ms(entry, BUDGET_FACES):.1f} ms p95,"
+            f" {entry['accuracy']['metric']} {entry['accuracy']['value']:.3f})"
         )
+        return entry["weights"]
 
-        self.plot = Plot(self.FRAMES_TO_REMEMBER)
-        self.text_objects = {}
+    def check_model(self):
+        if self.loader.is_alive():
+            self.after(100, self.check_model)
+            return
+        if self.model_error is not None:
+            # Nothing can run without the model, queued actions included
+            self.pending_action = None
+            for button in (
+                self.btn_camera,
+                self.btn_load,
+                self.btn_analyze,
+                self.btn_start_stop,
+                self.btn_record,
+            ):
+                button.configure(state="disabled")
+            self.video_label.configure(text="Model failed to load")
+            messagebox.showerror("Error", f"Could not load the model:\n{self.model_error}")
+            return
 
-        self.cap = None
-        self.is_running = False
+        from DisplaySurface import DisplaySurface
+
+        # Frames are pasted into one PhotoImage shown by self.video_surface
+        self.surface = DisplaySurface((640, 480))
+        self.model = self.loaded_model
+        self.report_startup()
+
+        action, self.pending_action = self.pending_action, None
+        if action is not None:
+            action()
+        elif not self.is_running:
+            self.video_label.configure(text="Load Camera/Video/Image")
 
-        # Keep track of the temp file to clean it up later
-        self.temp_video_path = "temp_downscaled.mp4"
+    def report_startup(self):
+        print(f"Startup: {startup.report()}")
+        self.stats_label.configure(text=f"Model ready after {startup.elapsed():.1f} s")
+
+    def when_ready(self, action):
+        # Runs action now, or once the model is loaded (only the latest one)
+        if self.analyzer is not None:
+            # The model is busy analyzing a video
+            return
+        if self.model is not None:
+            action()
+            return
+        if self.model_error is not None:
+            return
+        self.pending_action = action
+        self.video_label.configure(text="Loading model... will start when ready")
 
     def reset_plot(self):
-        cc = {
-            "Anger": [0,0.0],
-            "Contempt": [0,0.0],
-            "Disgust": [0,0.0],
-            "Fear": [0,0.0],
-            "Happy": [0,0.0],
-            "Neutral": [0,0.0],
-            "Sad": [0,0.0],
-            "Surprise": [0,0.0],
-        }
-        self.update_plot(cc)
         self.plot = Plot(self.FRAMES_TO_REMEMBER)
-        self.text_objects = {}
-        
+        if self.chart_range is not None:
+            # The history is not reset, only the live frames
+            self.update_plot(self.history_counts(), force=True)
+            return
+        # All zeros, clears the bars and labels
+        self.update_plot(self.plot.counts(), force=True)
 
     def init_window(self):
         self.geometry("1000x600")
@@ -71,6 +199,7 @@ class App(ctk.CTk):
 
         self.top_frame.grid_columnconfigure(0, weight=1)
         self.top_frame.grid_columnconfigure(1, weight=1)
+        self.top_frame.grid_columnconfigure(2, weight=1)
 
         self.btn_camera = ctk.CTkButton(
             self.top_frame,
@@ -87,7 +216,15 @@ class App(ctk.CTk):
             command=self.load_file,
             height=40,
         )
-        self.btn_load.grid(row=0, column=1, sticky="ew", padx=(5, 0))
+        self.btn_load.grid(row=0, column=1, sticky="ew", padx=5)
+
+        self.btn_analyze = ctk.CTkButton(
+            self.top_frame,
+            text="Analyze Video",
+            command=self.analyze_button,
+            height=40,
+        )
+        self.btn_analyze.grid(row=0, column=2, sticky="ew", padx=(5, 0))
 
         # ============================================================
         # MAIN VIDEO AREA
@@ -97,11 +234,27 @@ class App(ctk.CTk):
             row=1, column=0, sticky="nsew", padx=(10, 5), pady=(0, 10)
         )
 
-        self.video_label = ctk.CTkLabel(
-            self.video_frame, text="Load Camera/Video/Image"
-        )
+        self.video_label = ctk.CTkLabel(self.video_frame, text="Loading model...")
         self.video_label.place(relx=0.5, rely=0.5, anchor="center")
 
+        self.video_surface = tk.Label(self.video_frame, bg="#2b2b2b", bd=0)
+
+        # Only shown while playing back from a sidecar
+        self.seek_slider = ctk.CTkSlider(
+            self.video_frame, from_=0, to=1, command=self.on_seek
+        )
+
+        # Stage timings, toggled with F12
+        self.profile_label = tk.Label(
+            self.video_frame,
+            bg="#000000",
+            fg="#00ff00",
+            font=("Courier", 9),
+            justify="left",
+            anchor="nw",
+        )
+        self.profile_updated = 0.0
+
         # ============================================================
         # SIDEBAR
         # ============================================================
@@ -120,6 +273,17 @@ class App(ctk.CTk):
         )
         self.plot_placeholder.pack(fill="x", padx=10, pady=10)
 
+        self.range_selector = ctk.CTkSegmentedButton(
+            self.sidebar_frame,
+            values=list(self.CHART_RANGES),
+            command=self.select_range,
+        )
+        self.range_selector.set("Live")
+        self.range_selector.pack(fill="x", padx=10, pady=(0, 10))
+
+        self.stats_label = ctk.CTkLabel(self.sidebar_frame, text="")
+        self.stats_label.pack(pady=(0, 10))
+
         self.btn_start_stop = ctk.CTkButton(
             self.sidebar_frame,
             text="Stop",
@@ -128,61 +292,46 @@ class App(ctk.CTk):
         )
         self.btn_start_stop.pack(side="bottom", fill="x", padx=10, pady=20)
 
-        self.create_bar_chart()
+        self.btn_record = ctk.CTkButton(
+            self.sidebar_frame,
+            text="Record",
+            command=self.toggle_record,
+            height=40,
+        )
+        self.btn_record.pack(side="bottom", fill="x", padx=10)
 
         self.bind("<Configure>", self.resize_plot)
+        self.bind("<F12>", self.toggle_profiler)
+        self.bind("<Control-e>", self.export_trace)
+        self.bind("<Control-r>", self.toggle_record)
+        # Sidecar playback: 5 s jumps and 1x/2x/4x fast-forward
+        self.bind("<Left>", lambda event: self.seek_by(-5000))
+        self.bind("<Right>", lambda event: self.seek_by(5000))
+        self.bind("f", self.toggle_speed)
 
     # ============================================================
     # PLOT
     # ============================================================
     def create_bar_chart(self):
-        fig, ax = plt.subplots(figsize=(6, 3))
-        fig.subplots_adjust(left=0.24)
-
-        self.emotions = [
-            "Anger",
-            "Contempt",
-            "Disgust",
-            "Fear",
-            "Happy",
-            "Neutral",
-            "Sad",
-            "Surprise",
-        ]
-        values = np.zeros(len(self.emotions))
-
-        self.bars = ax.barh(self.emotions, values, color="#2196F3")
-        ax.set_xlim(0, 20)
-        ax.set_xlabel("Quantity", color="white")
-        ax.tick_params(axis='x', colors='white')
-        ax.tick_params(axis='y', colors='white')
-
-        fig.patch.set_facecolor("#2b2b2b")
-        ax.spines["top"].set_color("#2b2b2b")
-        ax.spines["right"].set_color("#2b2b2b")
-        ax.spines["left"].set_color("#2196F3")
-        ax.spines["bottom"].set_color("#2196F3")
-        ax.set_facecolor("#2b2b2b")
-        ax.grid(False)
-
-        self.canvas = FigureCanvasTkAgg(fig, master=self.plot_placeholder)
-        self.canvas.get_tk_widget().pack(fill="both", expand=True)
-        self.canvas.draw()
-
-        self.fig = fig
-        self.ax = ax
+        from EmotionChart import EmotionChart
+
+        self.chart = EmotionChart(
+            self.plot_placeholder, EMOTIONS, max_fps=self.CHART_FPS
+        )
 
     def resize_plot(self, event):
+        if self.chart is None:
+            return
         window_height = self.sidebar_frame.winfo_height()
-        plot_height = window_height - 156
+        plot_height = window_height - 272
         self.plot_placeholder.configure(height=plot_height)
         left_value = 0.15 + ((1 / self.top_frame.winfo_width()) * 100)
         left_value = max(0, min(left_value, 0.85))
-        self.fig.subplots_adjust(left=left_value)
+        self.chart.set_left(left_value)
 
     def camera_load_button(self):
         self.reset_plot()
-        self.load_camera()
+        self.when_ready(self.load_camera)
 
     def load_file(self):
         self.reset_plot()
@@ -191,190 +340,337 @@ class App(ctk.CTk):
         )
         if not file_path:
             return
+        self.when_ready(lambda: self.open_file(file_path))
+
+    def open_file(self, file_path):
+        from Sidecar import SidecarPlayer, load_sidecar
+        from Sources import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, open_source
 
         if self.is_running:
-            self.is_running = False
-            if self.cap:
-                self.cap.release()
-            self.btn_start_stop.configure(text="Start")
+            self.stop_pipeline()
 
         ext = os.path.splitext(file_path)[1].lower()
 
-        if ext in [".mp4", ".avi", ".mov"]:
-            self.video_label.configure(text="Preprocessing video... please wait...")
-            self.update()
+        if ext in VIDEO_EXTENSIONS:
+            self.sidecar = load_sidecar(file_path)
+            if self.sidecar is not None:
+                # Analyzed before: stored results, seekable, no inference
+                self.cap = SidecarPlayer(file_path, self.sidecar)
+                self.seek_slider.configure(to=max(self.sidecar.duration_ms(), 1))
+                self.seek_slider.set(0)
+                self.seek_slider.place(relx=0.5, rely=1.0, relwidth=0.9, y=-10, anchor="s")
+            else:
+                # Frames are downscaled while streaming and late frames are
+                # dropped to keep playback in real-time speed.
+                self.cap = open_source(file_path, target_width=640, realtime=True)
+            self.start_pipeline()
+
+        elif ext in IMAGE_EXTENSIONS:
+            self.display_image(open_source(file_path))
 
-            # Downscale the whole video first
-            optimized_path = self.preprocess_video(file_path)
+    # ============================================================
+    # SIDECAR
+    # ============================================================
+    def analyze_button(self):
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Video", "*.mp4 *.avi *.mov")]
+        )
+        if not file_path:
+            return
+        self.when_ready(lambda: self.analyze_file(file_path))
 
-            self.cap = cv2.VideoCapture(optimized_path)
-            self.is_running = True
-            self.is_video_file = True  # Enable skip logic
-            self.btn_start_stop.configure(text="Stop")
-            self.camera_loop()
+    def analyze_file(self, file_path):
+        # The whole video once on a worker thread, then played from the sidecar
+        if self.analyzer is not None:
+            return
+        if self.is_running:
+            self.stop_pipeline()
+        self.analysis_progress = (0, 0)
+        self.analysis_error = None
+        self.analyzer = threading.Thread(
+            target=self.run_analysis, args=(file_path,), daemon=True
+        )
+        self.analyzer.start()
+        self.video_label.configure(text="Analyzing...")
+        self.after(200, lambda: self.check_analysis(file_path))
+
+    def run_analysis(self, file_path):
+        # Worker thread, must not touch any widget
+        from Sidecar import write_sidecar
+
+        def progress(frame, total):
+            self.analysis_progress = (frame, total)
+
+        try:
+            write_sidecar(file_path, self.model, target_width=640, progress=progress)
+        except Exception as e:
+            self.analysis_error = e
+
+    def check_analysis(self, file_path):
+        if self.analyzer.is_alive():
+            frame, total = self.analysis_progress
+            self.stats_label.configure(text=f"Analyzing frame {frame} of {total}")
+            self.after(200, lambda: self.check_analysis(file_path))
+            return
+        self.analyzer = None
+        if self.analysis_error is not None:
+            messagebox.showerror("Error", f"Could not analyze the video:\n{self.analysis_error}")
+            return
+        self.stats_label.configure(text="")
+        self.open_file(file_path)
 
-        elif ext in [".jpg", ".png", ".jpeg"]:
-            frame = cv2.imread(file_path)
-            if frame is not None:
-                self.display_image(frame)
+    def on_seek(self, value):
+        if self.sidecar is None or not self.is_running:
+            return
+        self.cap.seek(value)
+        self.rebuild_plot(value)
 
-    def load_camera(self):
+    def seek_by(self, delta_ms):
+        if self.sidecar is None or not self.is_running:
+            return
+        position = min(max(self.cap.position_ms + delta_ms, 0), self.sidecar.duration_ms())
+        self.seek_slider.set(position)
+        self.on_seek(position)
+
+    def toggle_speed(self, event=None):
+        if self.sidecar is None or not self.is_running:
+            return
+        speed = {1.0: 2.0, 2.0: 4.0}.get(self.cap.speed, 1.0)
+        self.cap.set_speed(speed)
+        self.stats_label.configure(text=f"Playback {speed:.0f}x")
+
+    def rebuild_plot(self, position_ms):
+        # The chart as it would be after playing up to position_ms
+        self.plot = Plot(self.FRAMES_TO_REMEMBER)
+        last = self.sidecar.frame_at(position_ms)
+        for frame in range(max(0, last - self.FRAMES_TO_REMEMBER + 1), last + 1):
+            self.plot.updateArrays(*self.sidecar.frame_arrays(frame))
+        if self.chart_range is not None:
+            self.update_plot(self.history_counts(position_ms), force=True)
+        else:
+            self.update_plot(self.plot.counts(), force=True)
+
+    # ============================================================
+    # RECORDING
+    # ============================================================
+    def toggle_record(self, event=None):
+        if self.recorder is not None:
+            self.stop_recording()
+            return
         if not self.is_running:
-            self.cap = cv2.VideoCapture(1)
-            self.is_running = True
-            # camera does not need manual skipping
-            self.is_video_file = False
-            self.update_frame()
-
-    def preprocess_video(self, input_path):
-        """
-        Reads the input video. If it's larger than 640px wide, it downscales
-        the ENTIRE video to a temporary file before playback starts.
-        """
-        cap = cv2.VideoCapture(input_path)
-        if not cap.isOpened():
-            return input_path
-
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-
-        target_width = 640
-
-        # If video is already small enough, just return original path
-        if width <= target_width:
-            cap.release()
-            return input_path
-
-        # Calculate new dimensions
-        scale_ratio = target_width / width
-        new_width = target_width
-        new_height = int(height * scale_ratio)
-
-        # Setup Video Writer
-        # 'mp4v' is generally safe for mp4 containers in OpenCV
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        out = cv2.VideoWriter(
-            self.temp_video_path, fourcc, fps, (new_width, new_height)
-        )
+            return
 
-        print(f"Downscaling video from {width}x{height} to {new_width}x{new_height}...")
+        import cv2
+        from Recorder import Recorder
 
-        # Process every frame
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        # Encoding runs on the recorder's own thread, never on this one. The
+        # source rate is only the file's rate, frames are placed by timestamp
+        self.recorder = Recorder(fps=self.cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        self.recorder.start()
+        self.pipeline.recorder = self.recorder
+        self.btn_record.configure(text="Stop Recording")
 
-            resized_frame = cv2.resize(
-                frame, (new_width, new_height), interpolation=cv2.INTER_AREA
-            )
-            out.write(resized_frame)
+    def stop_recording(self):
+        if self.recorder is None:
+            return
+        if self.pipeline:
+            self.pipeline.recorder = None
+        self.recorder.stop()
+        print(f"Recording: {self.recorder.stats()} in {self.recorder.segments}")
+        self.recorder = None
+        self.btn_record.configure(text="Record")
 
-        cap.release()
-        out.release()
-        print("Downscaling complete.")
+    def load_camera(self):
+        from Sources import open_source
 
-        return self.temp_video_path
+        if not self.is_running:
+            self.cap = open_source(1)
+            # camera does not need manual skipping
+            self.start_pipeline()
 
     def start_stop(self):
         if self.is_running:
-            self.is_running = False
-            if self.cap:
-                self.cap.release()
-            self.video_label.configure(image=None)
-            self.btn_start_stop.configure(text="Start")
+            self.stop_pipeline()
+            self.video_surface.place_forget()
         else:
-            self.load_camera()
-            self.btn_start_stop.configure(text="Stop")
+            self.when_ready(self.load_camera)
 
-    def camera_loop(self):
-        if not self.is_running or not self.cap or not self.winfo_exists():
+    def start_pipeline(self):
+        from Pipeline import Pipeline
+
+        self.model.reset()
+        self.pipeline = Pipeline(
+            self.cap, self.model, annotate=self.surface.render, recorder=self.recorder
+        )
+        self.pipeline.start()
+        self.is_running = True
+        # Only relabeled once something actually runs
+        self.btn_start_stop.configure(text="Stop")
+        self.poll_pipeline()
+
+    def stop_pipeline(self):
+        self.is_running = False
+        self.btn_start_stop.configure(text="Start")
+        self.stop_recording()
+        if self.after_id is not None:
+            try:
+                self.after_cancel(self.after_id)
+            except Exception:
+                pass
+            self.after_id = None
+        if self.pipeline:
+            print(f"Dropped frames per stage: {self.pipeline.dropped_frames()}")
+            stats = self.pipeline.pacing_stats()
+            if stats is not None:
+                print(f"Playback pacing: {stats}")
+            print(f"Result reuse: {self.model.cache_stats()}")
+            self.pipeline.stop()
+            self.pipeline = None
+        elif self.cap:
+            self.cap.release()
+        self.cap = None
+        self.sidecar = None
+        self.seek_slider.place_forget()
+
+    def poll_pipeline(self):
+        self.after_id = None
+        if not self.is_running or not self.pipeline or not self.winfo_exists():
             return
 
-        # If we are playing a video file, we manually skip frames to simulate real-time speed.
-        if getattr(self, "is_video_file", False):
-            skip_rate = 2
-            for _ in range(skip_rate):
-                self.cap.grab()
+        # The UI thread only pastes frames the pipeline already finished
+        result = self.pipeline.get_result()
+        if result is not None:
+            self.show_result(result)
+            self.show_pacing_stats()
+        elif self.pipeline.is_done():
+            error = self.pipeline.error
+            self.start_stop()
+            if error is not None:
+                messagebox.showerror("Error", f"Playback stopped:\n{error}")
+            return
+
+        self.after_id = self.after(10, self.poll_pipeline)
+
+    def show_pacing_stats(self):
+        if self.frame_count % 15 != 0:
+            return
+        lines = []
+        stats = self.pipeline.pacing_stats()
+        if stats is not None:
+            lines.append(
+                f"{stats['fps']:.1f} FPS | dropped {stats['dropped_ratio']:.0%}"
+                f" | latency {stats['latency_ms']:.0f} ms"
+            )
+        if self.recorder is not None:
+            recording = self.recorder.stats()
+            lines.append(
+                f"REC {recording['written']} frames | dropped {recording['dropped']}"
+            )
+        if lines:
+            self.stats_label.configure(text="\n".join(lines))
+
+    def display_image(self, source):
+        from Pipeline import Pipeline
 
-        ret, frame = self.cap.read()
+        # The pipeline's stages inline, a single image needs no threads
+        ret, frame = source.read()
+        source.release()
         if ret:
-            self.display_image(frame)
+            pipeline = Pipeline(source, self.model, annotate=self.surface.render)
+            self.show_result(pipeline.process(frame))
 
-            after_id = self.after(10, self.update_frame)
-            self.after_ids.append(after_id)
-        else:
-            self.start_stop()
+    def show_result(self, result):
+        from FaceRecognition import plot_data_for
 
-    def display_image(self, frame):
-        frame_with_recognition, plot_data = self.model.predict(frame)
+        # view names the DisplaySurface buffer the frame was rendered into
+        self.show_frame(result.view, plot_data_for(result.detections))
 
+    def show_frame(self, view, plot_data):
         if not hasattr(self, "frame_count"):
             self.frame_count = 0
         self.frame_count += 1
 
         class_counts = self.plot.update(plot_data)
-        self.update_plot(class_counts)
-
-        # Convert for tkinter
-        pil_image = Image.fromarray(frame_with_recognition)
+        if self.sidecar is None:
+            # Played back videos are not part of the session
+            self.history.update(plot_data)
+        if self.chart_range is not None:
+            class_counts = self.history_counts()
+        if self.sidecar is not None and self.frame_count % 5 == 0:
+            self.seek_slider.set(self.cap.position_ms)
+        with profiler.stage("chart"):
+            self.update_plot(class_counts)
+
+        # Updates the PhotoImage in place, no new image objects per frame
+        with profiler.stage("tk_image"):
+            self.surface.show(view, self.video_surface)
+        self.show_profile()
+        if not self.video_surface.winfo_ismapped():
+            self.video_label.configure(text="")
+            self.video_surface.place(relx=0.5, rely=0.5, anchor="center")
+
+    def select_range(self, value):
+        self.chart_range = self.CHART_RANGES[value]
+        if self.chart_range is None:
+            self.update_plot(self.plot.counts(), force=True)
+        else:
+            self.update_plot(self.history_counts(), force=True)
+
+    def history_counts(self, position_ms=None):
+        # 0 is the whole session, or the whole video up to the playback
+        # position when playing back a sidecar
+        if self.sidecar is not None:
+            if position_ms is None:
+                position_ms = self.cap.position_ms
+            start = position_ms - self.chart_range * 1000 if self.chart_range else 0
+            # The frame shown at position_ms included
+            return self.sidecar.counts(start, position_ms + 1)
+        start = time.time() - self.chart_range if self.chart_range else 0
+        return self.history.counts(start)
+
+    def update_plot(self, class_counts, force=False):
+        if self.chart is None:
+            return
+        self.chart.update(class_counts, force=force)
 
-        # Ensure it fits the UI box
-        ctk_img = ctk.CTkImage(
-            light_image=pil_image, dark_image=pil_image, size=(640, 480)
-        )
-        self.video_label.configure(image=ctk_img, text="")
-        self.video_label.image = ctk_img
+    # ============================================================
+    # PROFILER
+    # ============================================================
+    def toggle_profiler(self, event=None):
+        profiler.enabled = not profiler.enabled
+        if profiler.enabled:
+            profiler.reset()
+            self.profile_label.configure(text="profiling...")
+            self.profile_label.place(x=5, y=5)
+            self.profile_label.lift()
+        else:
+            self.profile_label.place_forget()
 
-    def update_frame(self):
-        if not self.is_running or not self.winfo_exists():
+    def show_profile(self):
+        now = time.monotonic()
+        if not profiler.enabled or now - self.profile_updated < 0.25:
             return
-        self.camera_loop()
-
-    def update_plot(self, class_counts):
-        new_values = [item[0] for item in class_counts.values()]
-        new_confidences = [item[1] for item in class_counts.values()]
-
-        for bar, emotion, count, confidence in zip(
-            self.bars, self.emotions, new_values, new_confidences
-        ):
-            bar.set_width(count)
-            if emotion in self.text_objects:
-                if count <= 0:
-                    self.text_objects[emotion].remove()
-                    del self.text_objects[emotion]
-            if bar.get_width() > 0:
-                if emotion in self.text_objects:
-                    self.text_objects[emotion].remove()
-                self.text_objects[emotion] = self.ax.text(
-                    bar.get_width() + 3,
-                    bar.get_y() + bar.get_height() / 2,
-                    f"{confidence:.4f}",
-                    va="center",
-                    ha="center",
-                    color="white",
-                    fontsize=10,
-                )
-        self.ax.set_xlim(0, max(20, max(new_values) + 10))
-        self.canvas.draw()
+        self.profile_updated = now
+
+        summary = profiler.summary(window=2)
+        shown = summary.get("tk_image")
+        lines = [f"{shown['rate'] if shown else 0:5.1f} FPS   p50   p95   p99"]
+        for name, stage in summary.items():
+            lines.append(
+                f"{name:<9}{stage['p50_ms']:6.1f}{stage['p95_ms']:6.1f}"
+                f"{stage['p99_ms']:6.1f}"
+            )
+        self.profile_label.configure(text="\n".join(lines))
 
-    def on_close(self):
-        self.is_running = False
-        for aid in self.after_ids:
-            try:
-                self.after_cancel(aid)
-            except Exception:
-                pass
-        self.after_ids.clear()
-        if self.cap:
-            self.cap.release()
+    def export_trace(self, event=None):
+        os.makedirs("traces", exist_ok=True)
+        path = os.path.join("traces", time.strftime("trace_%Y%m%d_%H%M%S"))
+        profiler.export_chrome_trace(path + ".json")
+        profiler.export_csv(path + ".csv")
+        print(f"Trace saved to {path}.json and {path}.csv")
 
-        # Clean up temp file
-        if os.path.exists(self.temp_video_path):
-            try:
-                os.remove(self.temp_video_path)
-            except:
-                pass
+    def on_close(self):
+        self.stop_pipeline()
+        self.history.close()
 
         self.quit()
@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import polars as pl
+
+from Pipeline import Pipeline
+from Sources import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, ImageSource, open_source
+
+SCHEMA = {
+    "source": pl.String,
+    "frame": pl.Int64,
+    "timestamp_ms": pl.Float64,
+    "track_id": pl.Int64,
+    "x1": pl.Int32,
+    "y1": pl.Int32,
+    "x2": pl.Int32,
+    "y2": pl.Int32,
+    "emotion": pl.String,
+    "confidence": pl.Float32,
+}
+
+# Set once per worker process by init_worker
+model = None
+
+
+def init_worker(model_path, device, threads):
+    # One model per process, every worker only gets its share of the cores
+    global model
+    import torch
+    from FaceRecognition import FaceRecognition
+
+    cv2.setNumThreads(threads)
+    torch.set_num_threads(threads)
+    model = FaceRecognition(model_path, device=device)
+
+
+def collect_jobs(inputs, images_per_job):
+    # Every video is a job, images are grouped per directory
+    videos = []
+    images = {}
+    for path in inputs:
+        if os.path.isdir(path):
+            files = [
+                os.path.join(root, name)
+                for root, _, names in os.walk(path)
+                for name in sorted(names)
+            ]
+        else:
+            files = [path]
+
+        for file in files:
+            ext = os.path.splitext(file)[1].lower()
+            if ext in VIDEO_EXTENSIONS:
+                videos.append(file)
+            elif ext in IMAGE_EXTENSIONS:
+                images.setdefault(os.path.dirname(file), []).append(file)
+
+    jobs = [("video", video, [video]) for video in videos]
+    for directory, files in sorted(images.items()):
+        for start in range(0, len(files), images_per_job):
+            name = f"{directory}#{start // images_per_job}"
+            jobs.append(("images", name, files[start : start + images_per_job]))
+    return jobs
+
+
+def output_path(output_dir, name, fmt):
+    # Readable name plus a hash of the full path, so equal names don't collide
+    base = os.path.basename(name.rstrip("/\\")) or "input"
+    digest = hashlib.sha1(os.path.abspath(name).encode()).hexdigest()[:10]
+    return os.path.join(output_dir, f"{base}.{digest}.{fmt}")
+
+
+def rows_for(detections, source, frame, timestamp_ms, rows):
+    for detection in detections:
+        x1, y1, x2, y2 = detection.box
+        rows["source"].append(source)
+        rows["frame"].append(frame)
+        rows["timestamp_ms"].append(timestamp_ms)
+        rows["track_id"].append(detection.track_id)
+        rows["x1"].append(x1)
+        rows["y1"].append(y1)
+        rows["x2"].append(x2)
+        rows["y2"].append(y2)
+        rows["emotion"].append(detection.emotion)
+        rows["confidence"].append(detection.conf)
+
+
+def write_frame(df, path, fmt):
+    # Written under a temporary name first, a present file is always complete
+    tmp_path = path + ".tmp"
+    if fmt == "parquet":
+        df.write_parquet(tmp_path)
+    else:
+        df.write_csv(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_frame(path, fmt):
+    if fmt == "parquet":
+        return pl.read_parquet(path)
+    return pl.read_csv(path, schema=SCHEMA)
+
+
+def empty_rows():
+    return {column: [] for column in SCHEMA}
+
+
+def process_video(path, out_path, fmt, chunk_frames, tracking):
+    """
+    Analyzes a video in chunks of chunk_frames frames. Every finished chunk is
+    written as its own part file, so an interrupted run continues after the
+    last complete chunk. The parts are merged once the video is done.
+    """
+    part = 0
+    while os.path.exists(f"{out_path}.part{part:05d}"):
+        part += 1
+
+    start_frame = part * chunk_frames
+    # Full resolution, and lossless: every frame is analyzed in order
+    source = open_source(path, target_width=None, start_frame=start_frame)
+    pipeline = Pipeline(source, model, queue_size=8, lossless=True, track=tracking)
+    model.reset()
+
+    frame_index = start_frame
+    rows = empty_rows()
+    for result in pipeline.stream():
+        rows_for(result.detections, path, frame_index, result.timestamp_ms, rows)
+        frame_index += 1
+
+        if frame_index % chunk_frames == 0:
+            write_frame(
+                pl.DataFrame(rows, schema=SCHEMA), f"{out_path}.part{part:05d}", fmt
+            )
+            rows = empty_rows()
+            part += 1
+
+    parts = [f"{out_path}.part{i:05d}" for i in range(part)]
+    frames = [read_frame(p, fmt) for p in parts]
+    frames.append(pl.DataFrame(rows, schema=SCHEMA))
+    merged = pl.concat(frames)
+    write_frame(merged, out_path, fmt)
+    for p in parts:
+        os.remove(p)
+    return frame_index, merged.height
+
+
+def process_images(files, out_path, fmt):
+    source = ImageSource(files)
+    pipeline = Pipeline(source, model, queue_size=8, lossless=True)
+    rows = empty_rows()
+    for result in pipeline.stream():
+        index, file = source.returned[result.index]
+        rows_for(result.detections, file, index, 0.0, rows)
+    write_frame(pl.DataFrame(rows, schema=SCHEMA), out_path, fmt)
+    return len(files), len(rows["source"])
+
+
+def run_job(job, out_path, fmt, chunk_frames, tracking):
+    kind, name, files = job
+    start = time.perf_counter()
+    if kind == "video":
+        frames, faces = process_video(name, out_path, fmt, chunk_frames, tracking)
+    else:
+        frames, faces = process_images(files, out_path, fmt)
+    return name, frames, faces, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Analyze videos and images without the GUI"
+    )
+    parser.add_argument("inputs", nargs="+", help="video/image files or directories")
+    parser.add_argument("--output", default="./analysis")
+    parser.add_argument("--format", default="parquet", choices=["parquet", "csv"])
+    parser.add_argument(
+        "--weights", default="./results/yolo11x_training_epochs300_128/weights/best.pt"
+    )
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--workers", type=int, default=max(1, os.cpu_count() // 4))
+    parser.add_argument("--chunk-frames", type=int, default=5000)
+    parser.add_argument("--images-per-job", type=int, default=500)
+    parser.add_argument(
+        "--no-tracking",
+        action="store_true",
+        help="run detection and classification on every video frame",
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    jobs = collect_jobs(args.inputs, args.images_per_job)
+
+    # Finished outputs from an earlier run are skipped
+    pending = []
+    for job in jobs:
+        out_path = output_path(args.output, job[1], args.format)
+        if os.path.exists(out_path):
+            print(f"Skipping {job[1]}, already analyzed")
+        else:
+            pending.append((job, out_path))
+    print(f"{len(pending)} of {len(jobs)} jobs to run on {args.workers} workers")
+
+    threads = max(1, os.cpu_count() // args.workers)
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(args.weights, args.device, threads),
+    ) as pool:
+        futures = [
+            pool.submit(
+                run_job,
+                job,
+                out_path,
+                args.format,
+                args.chunk_frames,
+                not args.no_tracking,
+            )
+            for job, out_path in pending
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            name, frames, faces, seconds = future.result()
+            print(
+                f"[{done}/{len(futures)}] {name}: {frames} frames, "
+                f"{faces} faces in {seconds:.1f}s ({frames / max(seconds, 1e-6):.1f} fps)"
+            )
@@ -0,0 +1,296 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# CPU only and no network, set before torch/ultralytics are imported
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+os.environ["YOLO_OFFLINE"] = "1"
+
+import multiprocessing
+
+import cv2
+import numpy as np
+import psutil
+
+# name -> FaceRecognition / FaceDetector settings, compared side by side
+VARIANTS = {
+    "default": {},
+    "every_frame": {"detect_every": 1, "classify_every": 1},
+    "full_detect": {"full_detect_every": 1},
+    "tiled": {"detector": {"tile_size": 320}},
+    # Not part of the repo, from the OpenCV model zoo (models/face_detection_yunet)
+    "yunet": {
+        "detector": {"backend": "yunet", "model_path": "./face_detection_yunet_2023mar.onnx"}
+    },
+    # every frame runs the models, nothing is reused
+    "no_reuse": {"static_threshold": -1, "cache_size": 0},
+}
+
+
+def peak_rss_mb():
+    # Peak resident set size of this process so far
+    info = psutil.Process().memory_info()
+    if hasattr(info, "peak_wset"):
+        return info.peak_wset / 2**20
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def percentiles(times):
+    p50, p95, p99 = np.percentile(np.asarray(times) * 1000, [50, 95, 99])
+    return {
+        "mean_ms": float(np.mean(times) * 1000),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+    }
+
+
+def collect_images(sample, seed):
+    # Every test image plus a fixed random sample of the YOLO test split
+    images = sorted(glob.glob("../test_data/*.jpg"))
+    test_split = sorted(
+        path
+        for pattern in ("*.jpg", "*.png")
+        for path in glob.glob(os.path.join("../YOLO_format/test/images", pattern))
+    )
+    if sample and test_split:
+        rng = np.random.default_rng(seed)
+        picked = rng.choice(len(test_split), min(sample, len(test_split)), replace=False)
+        images += [test_split[i] for i in sorted(picked)]
+    return images
+
+
+def synthetic_video(images, frames_per_image=15, size=(640, 480)):
+    """
+    Generator of frames assembled from the images: each one is letterboxed
+    to `size` and panned a few pixels per frame, so the tracker sees slowly
+    moving faces and a cut every `frames_per_image` frames. Frames are made
+    one at a time, the video is never held in memory as a whole.
+    """
+    w, h = size
+    for image in images:
+        scale = min(w / image.shape[1], h / image.shape[0]) * 0.9
+        resized = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        rh, rw = resized.shape[:2]
+        for i in range(frames_per_image):
+            frame = np.zeros((h, w, 3), dtype=np.uint8)
+            x = min(w - rw, (w - rw) // 4 + 2 * i)
+            y = (h - rh) // 2
+            frame[y : y + rh, x : x + rw] = resized
+            yield frame
+
+
+def build_model(weights, settings):
+    from FaceDetector import FaceDetector, create_backend
+    from FaceRecognition import FaceRecognition
+
+    settings = dict(settings)
+    detector = settings.pop("detector", None)
+    if detector is not None:
+        detector = dict(detector)
+        name = detector.pop("backend", "haar")
+        model_path = detector.pop("model_path", None)
+        detector = FaceDetector(create_backend(name, model_path), **detector)
+    return FaceRecognition(weights, detector=detector, device="cpu", **settings)
+
+
+def missing_model(settings):
+    # Detector model file a variant needs but that is not there, else None
+    model_path = settings.get("detector", {}).get("model_path")
+    if model_path is not None and not os.path.exists(model_path):
+        return model_path
+    return None
+
+
+def run_frames(model, make_frames, track, runs):
+    """
+    Warm latency of predict() over `runs` passes through the frames
+    make_frames() yields. Throughput only counts the time spent in
+    predict(), not making the frames. reuse are the frames the model
+    answered from its static-frame check during these passes.
+    """
+    times = []
+    faces = 0
+    before = model.cache_stats()
+    for _ in range(runs):
+        model.reset()
+        for frame in make_frames():
+            t = time.perf_counter()
+            _, plot_data = model.predict(frame, track=track)
+            times.append(time.perf_counter() - t)
+            faces += len(plot_data)
+    elapsed = sum(times)
+    after = model.cache_stats()
+    return {
+        "frames": len(times),
+        "faces": faces,
+        "fps": len(times) / elapsed,
+        "faces_per_s": faces / elapsed,
+        "reuse": {key: after[key] - before[key] for key in after},
+        **percentiles(times),
+    }
+
+
+def run_variant(name, settings, weights, image_paths, frames_per_image, runs, threads):
+    # Runs in a fresh process that reads the inputs itself, so cold start and
+    # peak RSS belong to this variant and not to the benchmark inputs
+    import torch
+
+    cv2.setNumThreads(threads)
+    torch.set_num_threads(threads)
+    start_rss = peak_rss_mb()
+
+    start = time.perf_counter()
+    try:
+        model = build_model(weights, settings)
+    except Exception as e:
+        return {"variant": name, "settings": settings, "error": str(e)}
+    load_s = time.perf_counter() - start
+
+    images = [cv2.imread(path) for path in image_paths]
+    images = [image for image in images if image is not None]
+    if not images:
+        return {
+            "variant": name,
+            "settings": settings,
+            "error": f"none of the {len(image_paths)} input images could be decoded",
+        }
+
+    # Cold: the very first predict after loading, before any caches are warm
+    start = time.perf_counter()
+    model.predict(images[0].copy(), track=False)
+    first_predict_s = time.perf_counter() - start
+
+    # Every warm pass repeats the same inputs, the content-keyed result cache
+    # would turn all but the first pass into lookups
+    from FrameCache import ResultCache
+
+    model.results = ResultCache(0)
+
+    return {
+        "variant": name,
+        "settings": settings,
+        "cold": {"load_ms": load_s * 1000, "first_predict_ms": first_predict_s * 1000},
+        "images": run_frames(
+            model, lambda: (image.copy() for image in images), track=False, runs=runs
+        ),
+        "video": run_frames(
+            model, lambda: synthetic_video(images, frames_per_image), track=True, runs=runs
+        ),
+        "rss_mb": {"start": start_rss, "peak": peak_rss_mb()},
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    import torch
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "torch": torch.__version__,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline CPU benchmark of FaceRecognition.predict"
+    )
+    parser.add_argument(
+        "--weights", default="./results/yolo11x_training_epochs300_128/weights/best.pt"
+    )
+    parser.add_argument(
+        "--variants", nargs="+", default=["default"], choices=list(VARIANTS)
+    )
+    parser.add_argument(
+        "--sample", type=int, default=50, help="images taken from YOLO_format/test"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--frames-per-image", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3, help="warm passes per input")
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    args = parser.parse_args()
+
+    image_paths = collect_images(args.sample, args.seed)
+    if not image_paths:
+        sys.exit("No benchmark images found")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "args": vars(args),
+        "inputs": {"images": image_paths},
+        "results": [],
+    }
+
+    context = multiprocessing.get_context("spawn")
+    for name in args.variants:
+        missing = missing_model(VARIANTS[name])
+        if missing is not None:
+            print(f"Skipping {name}: {missing} not found")
+            report["results"].append(
+                {"variant": name, "settings": VARIANTS[name], "skipped": f"{missing} not found"}
+            )
+            continue
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(
+                run_variant,
+                name,
+                VARIANTS[name],
+                args.weights,
+                image_paths,
+                args.frames_per_image,
+                args.runs,
+                args.threads,
+            ).result()
+        report["results"].append(result)
+
+    print(
+        f"{'variant':<12} {'input':<7} {'load ms':>8} {'p50 ms':>8} {'p95 ms':>8}"
+        f" {'p99 ms':>8} {'fps':>7} {'faces/s':>8} {'peak MB':>8}"
+    )
+    for result in report["results"]:
+        if "skipped" in result:
+            print(f"{result['variant']:<12} skipped: {result['skipped']}")
+            continue
+        if "error" in result:
+            print(f"{result['variant']:<12} failed: {result['error']}")
+            continue
+        for key in ("images", "video"):
+            stats = result[key]
+            print(
+                f"{result['variant']:<12} {key:<7} {result['cold']['load_ms']:>8.0f}"
+                f" {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f}"
+                f" {stats['p99_ms']:>8.2f} {stats['fps']:>7.1f}"
+                f" {stats['faces_per_s']:>8.1f} {result['rss_mb']['peak']:>8.0f}"
+            )
+
+    output = args.output or os.path.join(
+        "benchmarks", time.strftime("bench_%Y%m%d_%H%M%S.json")
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
@@ -0,0 +1,21 @@
+import argparse
+
+from DatasetCache import build_cache, open_cache
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pack the YOLO dataset into memory-mapped arrays for training"
+    )
+    parser.add_argument("--data", default="../YOLO_format/data.yaml")
+    parser.add_argument("--imgsz", type=int, default=128)
+    parser.add_argument("--cache-dir", default=None, help="default: next to data.yaml")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--force", action="store_true", help="rebuild even if up to date")
+    args = parser.parse_args()
+
+    cache_dir = build_cache(
+        args.data, args.imgsz, args.cache_dir, workers=args.workers, force=args.force
+    )
+    for split, cached in open_cache(args.data, args.imgsz, cache_dir, check=False).items():
+        print(f"{split}: {len(cached)} images, {len(cached.labels)} labels")
+    print(f"Cache ready in {cache_dir}")
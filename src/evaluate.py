@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import time
+
+import polars as pl
+import yaml
+
+from EmotionBackend import preferred_artifact
+from Evaluation import bin_slices, evaluate_slices, predict_images, tag_slices
+from LabelManifest import load_manifest
+
+
+def parse_bins(spec):
+    # "brightness=0,64,128,192,256"
+    column, edges = spec.split("=")
+    return column, [float(edge) for edge in edges.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Evaluate a checkpoint on a dataset split, sliced by conditions"
+    )
+    parser.add_argument(
+        "--weights", default="./results/yolo11x_training_epochs300_128/weights/best.pt"
+    )
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--data", default="../YOLO_format/data.yaml")
+    parser.add_argument("--split", default="test")
+    parser.add_argument("--cache-dir", default="../eval_cache")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--bins",
+        nargs="*",
+        default=["brightness=0,64,128,192,256", "contrast=0,32,64,128"],
+        help="column=edges, columns: brightness, contrast, saturation",
+    )
+    parser.add_argument(
+        "--tags", nargs="*", default=[], help="CSV files with columns image,tag"
+    )
+    parser.add_argument("--per-class", action="store_true")
+    parser.add_argument("--output", default=None, help="write the full report to JSON")
+    args = parser.parse_args()
+
+    with open(args.data) as f:
+        names = yaml.safe_load(f)["names"]
+
+    # Ground truth from the label manifest, the primary class of each image
+    manifest = load_manifest(args.data).filter(pl.col("split") == args.split)
+    model_path = preferred_artifact(args.weights, args.device)
+    results = predict_images(
+        model_path,
+        manifest["image"].to_list(),
+        args.cache_dir,
+        device=args.device,
+        workers=args.workers,
+    ).join(
+        # By image, not by position
+        manifest.select("image", truth="primary"),
+        on="image",
+        how="left",
+        maintain_order="left",
+    ).with_columns(
+        name=pl.col("image").map_elements(os.path.basename, return_dtype=pl.String),
+    )
+
+    slices = {}
+    for spec in args.bins:
+        slices.update(bin_slices(*parse_bins(spec)))
+    for tags_csv in args.tags:
+        slices.update(tag_slices(tags_csv))
+
+    start = time.perf_counter()
+    report = evaluate_slices(results, slices, names)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"{'slice':<32} {'images':>7} {'accuracy':>9} {'recall':>7} {'no face':>8}")
+    for name, metrics in report.items():
+        print(
+            f"{name:<32} {metrics['images']:>7} {metrics['accuracy']:>9.3f}"
+            f" {metrics['macro_recall']:>7.3f} {metrics['no_face']:>8}"
+        )
+        if args.per_class:
+            for emotion, stats in metrics["per_class"].items():
+                print(
+                    f"    {emotion:<12} P {stats['precision']:.3f}"
+                    f"  R {stats['recall']:.3f}  n {stats['support']}"
+                )
+    print(f"{len(report)} slices in {elapsed:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"model": model_path, "split": args.split, "slices": report}, f, indent=2)
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from ultralytics import YOLO
+
+from CropBatch import CropBatch
+from EmotionBackend import load_backend, select_device
+
+
+def export_models(weights, batch=8, formats=("onnx",), half=False, int8=False):
+    # Static 128x128 input with a fixed batch, exported next to the weights
+    model = YOLO(weights)
+    device = select_device()
+    exported = []
+
+    if "onnx" in formats:
+        onnx_path = model.export(
+            format="onnx",
+            imgsz=128,
+            batch=batch,
+            dynamic=False,
+            simplify=True,
+            half=half and device != "cpu",
+            device=device,
+        )
+        exported.append(onnx_path)
+
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            int8_path = os.path.splitext(onnx_path)[0] + "_int8.onnx"
+            quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+            exported.append(int8_path)
+
+    if "openvino" in formats:
+        exported.append(
+            model.export(format="openvino", imgsz=128, batch=batch, half=half)
+        )
+        if int8:
+            # NNCF post-training quantization calibrated on the dataset
+            exported.append(
+                model.export(
+                    format="openvino",
+                    imgsz=128,
+                    batch=batch,
+                    int8=True,
+                    data="../YOLO_format/data.yaml",
+                )
+            )
+
+    return exported
+
+
+def measure_latency(model_path, batch_sizes=(1, 4, 8), runs=50, device=None):
+    backend = load_backend(model_path, device=device)
+    backend.warmup()
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    crops = CropBatch(
+        max_faces=max(batch_sizes), center_crop=backend.task == "classify"
+    )
+
+    latencies = {}
+    for batch_size in batch_sizes:
+        boxes = [(40 * i, 40, 40 * i + 160, 200) for i in range(batch_size)]
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            backend.predict(crops.fill(frame, boxes))
+            times.append((time.perf_counter() - start) * 1000)
+        latencies[batch_size] = {
+            "p50_ms": float(np.percentile(times, 50)),
+            "p95_ms": float(np.percentile(times, 95)),
+        }
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the emotion model for CPU inference and compare latency"
+    )
+    parser.add_argument(
+        "--weights", default="./results/yolo11x_training_epochs300_128/weights/best.pt"
+    )
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument(
+        "--formats", nargs="+", default=["onnx"], choices=["onnx", "openvino"]
+    )
+    parser.add_argument("--half", action="store_true", help="FP16 weights")
+    parser.add_argument("--int8", action="store_true", help="also write INT8 variants")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--report", default=None, help="write latencies to JSON")
+    args = parser.parse_args()
+
+    exported = export_models(
+        args.weights, args.batch, args.formats, half=args.half, int8=args.int8
+    )
+
+    report = {}
+    for model_path in [args.weights] + exported:
+        report[model_path] = measure_latency(model_path, runs=args.runs)
+
+    print(f"{'model':<70} {'batch':>5} {'p50 ms':>8} {'p95 ms':>8}")
+    for model_path, latencies in report.items():
+        for batch_size, stats in latencies.items():
+            print(
+                f"{model_path:<70} {batch_size:>5} "
+                f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f}"
+            )
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,80 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import polars as pl
+import yaml
+
+from LabelManifest import load_manifest
+
+
+def crop_face(image, box, margin, size):
+    """
+    Face from a normalized (xc, yc, w, h) label box, widened by `margin` of
+    the box on every side like the app pads the detector boxes, and
+    downscaled so the long side is at most `size`. Crops keep their aspect
+    ratio, ultralytics resizes and center-crops them to imgsz when
+    training, and CropBatch(center_crop=True) does the same at inference.
+    """
+    h_max, w_max = image.shape[:2]
+    xc, yc, w, h = box
+    pad_w, pad_h = w * margin, h * margin
+    x1 = int(max(0, (xc - w / 2 - pad_w) * w_max))
+    y1 = int(max(0, (yc - h / 2 - pad_h) * h_max))
+    x2 = int(min(w_max, (xc + w / 2 + pad_w) * w_max))
+    y2 = int(min(h_max, (yc + h / 2 + pad_h) * h_max))
+    if x2 <= x1 or y2 <= y1:
+        return None
+
+    crop = image[y1:y2, x1:x2]
+    scale = size / max(crop.shape[:2])
+    if scale < 1:
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return crop
+
+
+def extract(row, out_dir, names, margin, size):
+    image = cv2.imread(row["image"])
+    if image is None:
+        return 0
+    stem = os.path.splitext(os.path.basename(row["image"]))[0]
+    written = 0
+    for i, (cls_id, box) in enumerate(zip(row["classes"], row["boxes"])):
+        crop = crop_face(image, box, margin, size)
+        if crop is None:
+            continue
+        class_dir = os.path.join(out_dir, row["split"], names[cls_id])
+        cv2.imwrite(os.path.join(class_dir, f"{stem}_{i}.png"), crop)
+        written += 1
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Cut labelled faces out of YOLO_format into a classify dataset"
+    )
+    parser.add_argument("--data", default="../YOLO_format/data.yaml")
+    parser.add_argument("--output", default="../YOLO_format_cls")
+    parser.add_argument("--margin", type=float, default=0.15, help="of the box size")
+    parser.add_argument("--size", type=int, default=160, help="max long side in px")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with open(args.data) as f:
+        names = yaml.safe_load(f)["names"]
+
+    manifest = load_manifest(args.data)
+    rows = manifest.filter(~pl.col("empty")).to_dicts()
+    for split in manifest["split"].unique().to_list():
+        for name in names:
+            os.makedirs(os.path.join(args.output, split, name), exist_ok=True)
+
+    # cv2 releases the GIL while decoding, resizing and encoding
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        written = sum(
+            executor.map(
+                lambda row: extract(row, args.output, names, args.margin, args.size), rows
+            )
+        )
+    print(f"{written} face crops from {len(rows)} images written to {args.output}")
@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import time
+
+from EmotionBackend import preferred_artifact, select_device
+from export import measure_latency
+from ModelSelection import (
+    METRICS,
+    find_checkpoints,
+    latency_ms,
+    machine_id,
+    pareto_front,
+    read_accuracy,
+    select_model,
+    task_of,
+)
+
+
+def validate_accuracy(weights_path, data_yaml, cls_data, device=None):
+    # Runs the validation split when the training run left no results.csv
+    from ultralytics import YOLO
+
+    model = YOLO(weights_path)
+    data = cls_data if model.task == "classify" else data_yaml
+    metrics = model.val(
+        data=data, imgsz=128, device=select_device(device), plots=False, verbose=False
+    )
+    value = metrics.top1 if model.task == "classify" else metrics.box.map
+    return {"metric": METRICS[model.task], "value": float(value), "source": "val"}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Latency vs accuracy of every trained checkpoint on this machine"
+    )
+    parser.add_argument("--results", default="./results")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="run validation for every checkpoint, not only those without results.csv",
+    )
+    parser.add_argument("--data", default="../YOLO_format/data.yaml")
+    parser.add_argument("--cls-data", default="../YOLO_format_cls")
+    parser.add_argument("--budget-ms", type=float, default=None, help="per-frame latency target")
+    parser.add_argument("--faces", type=int, default=1, help="batch size the budget is for")
+    parser.add_argument("--report", default=None)
+    args = parser.parse_args()
+    if args.faces not in args.batch_sizes:
+        parser.error("--faces must be one of --batch-sizes")
+
+    # The app runs on whatever is exported next to the checkpoint on CPU
+    entries = []
+    for weights in find_checkpoints(args.results):
+        accuracy = None if args.validate else read_accuracy(weights)
+        if accuracy is None:
+            accuracy = validate_accuracy(weights, args.data, args.cls_data)
+        artifact = preferred_artifact(weights, "cpu")
+        latencies = measure_latency(artifact, args.batch_sizes, args.runs, device="cpu")
+        entries.append(
+            {
+                "weights": weights,
+                "task": task_of(accuracy),
+                "artifact": artifact,
+                "accuracy": accuracy,
+                "latency": {str(size): stats for size, stats in latencies.items()},
+            }
+        )
+    if not entries:
+        raise SystemExit(f"No checkpoints under {args.results}/*/weights")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": machine_id(),
+        "batch_sizes": args.batch_sizes,
+        "latency_covers": "emotion model only, face detection is not included",
+        "entries": entries,
+    }
+
+    tasks = sorted({entry["task"] for entry in entries})
+    for task in tasks:
+        task_entries = [entry for entry in entries if entry["task"] == task]
+        for size in args.batch_sizes:
+            front = pareto_front(task_entries, size)
+            print(f"\n{task}, batch {size}, accuracy = {METRICS[task]}")
+            print(
+                f"{'checkpoint':<60} {'p50 ms':>8} {'p95 ms':>8} {'accuracy':>9}  pareto"
+            )
+            for entry in sorted(task_entries, key=lambda entry: latency_ms(entry, size)):
+                stats = entry["latency"][str(size)]
+                print(
+                    f"{entry['artifact']:<60} {stats['p50_ms']:>8.2f}"
+                    f" {stats['p95_ms']:>8.2f} {entry['accuracy']['value']:>9.3f}"
+                    f"  {'*' if entry in front else ''}"
+                )
+
+    if args.budget_ms is not None:
+        # The budget is for the emotion model, face detection comes on top
+        print(f"\n{args.budget_ms:.1f} ms of emotion model with {args.faces} face(s):")
+        for task in tasks:
+            best = select_model(report, args.budget_ms, task, args.faces)
+            fits = latency_ms(best, args.faces) <= args.budget_ms
+            print(
+                f"  {task}: {best['weights']}" + ("" if fits else " (nothing fits, fastest)")
+            )
+
+    output = args.report or os.path.join(args.results, "model_report.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {output}")
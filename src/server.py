@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import json
+
+from InferenceServer import InferenceServer
+
+
+async def report(server, every):
+    while True:
+        await asyncio.sleep(every)
+        print(json.dumps(server.metrics()))
+
+
+async def main(args):
+    server = InferenceServer(
+        args.weights,
+        device=args.device,
+        max_batch=args.max_batch,
+        max_latency_ms=args.max_latency_ms,
+        max_pending=args.max_pending,
+    )
+    print(f"Serving {args.weights} on {args.host}:{args.port}")
+    if args.report_every:
+        asyncio.create_task(report(server, args.report_every))
+    await server.serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve one emotion model to many camera/video streams"
+    )
+    parser.add_argument(
+        "--weights", default="./results/yolo11x_training_epochs300_128/weights/best.pt"
+    )
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument(
+        "--max-latency-ms",
+        type=float,
+        default=10,
+        help="longest a face waits for its batch to fill",
+    )
+    parser.add_argument(
+        "--max-pending", type=int, default=256, help="faces queued before streams wait"
+    )
+    parser.add_argument("--report-every", type=float, default=10, help="seconds, 0 = off")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from Sources import IMAGE_EXTENSIONS
+from StreamProtocol import encode_image, read_message, write_message
+
+
+def frames_of(path, max_frames, width):
+    # Video frames, or a still image repeated, downscaled to `width`
+    if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+        image = cv2.imread(path)
+        frames = (image for _ in range(max_frames if image is not None else 0))
+        fps = 30.0
+    else:
+        cap = cv2.VideoCapture(path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+        def read():
+            for _ in range(max_frames):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame
+            cap.release()
+
+        frames = read()
+
+    def resized():
+        for frame in frames:
+            if frame.shape[1] > width:
+                scale = width / frame.shape[1]
+                frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            yield frame
+
+    return resized(), fps
+
+
+def next_payload(frames):
+    # Next frame read, resized and encoded, None at the end. Runs in a
+    # worker thread, the event loop keeps receiving the other streams' replies
+    frame = next(frames, None)
+    return None if frame is None else encode_image(frame)
+
+
+async def replay(name, path, args):
+    """
+    Sends one file as a stream. With --realtime frames go out at the source
+    frame rate whether or not the replies kept up, otherwise the next frame
+    is only sent once the previous reply arrived.
+    """
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    await write_message(writer, {"type": "hello", "stream": name})
+
+    sent = {}
+    latencies = []
+    counts = {"ok": 0, "dropped": 0, "error": 0, "faces": 0}
+    replied = asyncio.Event()
+
+    async def receive():
+        while True:
+            message = await read_message(reader)
+            if message is None:
+                return
+            header, _ = message
+            status = header.get("status")
+            if status is None:
+                continue
+            counts[status] = counts.get(status, 0) + 1
+            start = sent.pop(header.get("seq"), None)
+            if status == "ok":
+                counts["faces"] += len(header["faces"])
+                if start is not None:
+                    latencies.append(time.perf_counter() - start)
+            replied.set()
+
+    receiver = asyncio.create_task(receive())
+    frames, fps = await asyncio.to_thread(frames_of, path, args.max_frames, args.width)
+    start = time.perf_counter()
+
+    seq = 0
+    while True:
+        payload = await asyncio.to_thread(next_payload, frames)
+        if payload is None:
+            break
+        if args.realtime:
+            delay = start + seq / fps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        sent[seq] = time.perf_counter()
+        replied.clear()
+        await write_message(writer, {"type": "frame", "seq": seq}, payload)
+        if not args.realtime:
+            await replied.wait()
+        seq += 1
+
+    # Give the last replies a moment to arrive
+    deadline = time.perf_counter() + 5
+    while sent and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    receiver.cancel()
+    writer.close()
+
+    stats = {"stream": name, "file": path, **counts, "fps": counts["ok"] / elapsed}
+    if latencies:
+        p50, p95 = np.percentile(np.asarray(latencies) * 1000, [50, 95])
+        stats.update(p50_ms=float(p50), p95_ms=float(p95))
+    return stats
+
+
+async def server_metrics(args):
+    # A metrics request as the first message, not a stream of its own
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    await write_message(writer, {"type": "metrics"})
+    message = await read_message(reader)
+    writer.close()
+    return message[0] if message else None
+
+
+async def main(args):
+    names = [f"stream{i}" for i in range(args.streams)]
+    paths = [args.files[i % len(args.files)] for i in range(args.streams)]
+    results = await asyncio.gather(
+        *(replay(name, path, args) for name, path in zip(names, paths))
+    )
+    for stats in results:
+        print(json.dumps(stats))
+    print(json.dumps(await server_metrics(args), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay videos/images as parallel streams against server.py"
+    )
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--streams", type=int, default=None, help="default: one per file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument(
+        "--realtime", action="store_true", help="send at the source frame rate"
+    )
+    args = parser.parse_args()
+    args.streams = args.streams or len(args.files)
+
+    asyncio.run(main(args))
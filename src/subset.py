@@ -0,0 +1,41 @@
+import argparse
+import json
+
+from LabelManifest import load_manifest, stratified_subset, write_subset
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Stratified training subsets for quick hyperparameter sweeps"
+    )
+    parser.add_argument("--data", default="../YOLO_format/data.yaml")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--fraction", type=float, help="e.g. 0.05 for 5 %% of train")
+    size.add_argument("--size", type=int, help="number of images")
+    parser.add_argument(
+        "--balanced", action="store_true", help="same number of images per class"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--name", default=None, help="default: from the options")
+    parser.add_argument("--rebuild", action="store_true", help="rescan the label files")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.data, rebuild=args.rebuild)
+    images = stratified_subset(
+        manifest,
+        fraction=args.fraction,
+        size=args.size,
+        balanced=args.balanced,
+        seed=args.seed,
+    )
+
+    name = args.name or "train_{}{}_seed{}".format(
+        args.size or f"{args.fraction:g}",
+        "_balanced" if args.balanced else "",
+        args.seed,
+    )
+    subset_yaml = write_subset(args.data, images, name)
+
+    picked = manifest.filter(manifest["image"].is_in(images))
+    counts = picked["primary"].value_counts().sort("primary")
+    print(json.dumps(dict(zip(counts["primary"].to_list(), counts["count"].to_list()))))
+    print(f"{len(images)} images, train with data={subset_yaml}")
@@ -1,7 +1,14 @@
 from ultralytics import YOLO
+from CachedTraining import CachedDetectionTrainer
+from DatasetCache import build_cache
+from EmotionBackend import select_device
 
 if __name__ == "__main__":
     data_yaml = "../YOLO_format/data.yaml"
+    # Decode and resize the dataset once, epochs then read the memmap
+    build_cache(data_yaml, imgsz=128)
+    # Quick sweeps: class-balanced 5 % of train, see subset.py
+    # data_yaml = "../YOLO_format/subsets/train_0.05_balanced_seed0.yaml"
 
     # Train (or load trained model)
     model = YOLO("yolo11s.pt")
@@ -9,13 +16,14 @@ if __name__ == "__main__":
     # model = YOLO("./results/yolo11s_training_epochs200/weights/best.pt")
 
     results = model.train(
+        trainer=CachedDetectionTrainer,
         data=data_yaml,
         epochs=300,
         imgsz=128,
         batch=-1,  # auto
         name="yolo11s_training_epochs300_128",
         project="./results",
-        device="0",
+        device=select_device(),
         mosaic=0.0,
         # shear=10,
         # perspective=0.0005,
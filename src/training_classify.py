@@ -0,0 +1,24 @@
+from ultralytics import YOLO
+from EmotionBackend import select_device
+
+if __name__ == "__main__":
+    # Face crops per emotion, built by extract_crops.py from YOLO_format.
+    # The classify model gives a softmax over the 8 emotions in one forward
+    # pass, no boxes or NMS, which is all the app needs once the face
+    # detector found the face.
+    data_dir = "../YOLO_format_cls"
+
+    model = YOLO("yolo11s-cls.pt")
+
+    results = model.train(
+        data=data_dir,
+        epochs=100,
+        imgsz=128,
+        batch=-1,  # auto
+        name="yolo11s_cls_epochs100_128",
+        project="./results",
+        device=select_device(),
+        # Faces are upright, keep flips but no rotation
+        fliplr=0.5,
+        erasing=0.2,
+    )
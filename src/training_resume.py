@@ -1,5 +1,7 @@
 from ultralytics import YOLO
 import os
+from CachedTraining import CachedDetectionTrainer
+from EmotionBackend import select_device
 
 if __name__ == "__main__":
     # 1. Path to the LAST checkpoint from your interrupted run
@@ -14,6 +16,8 @@ if __name__ == "__main__":
         # 3. Call train() with resume=True
         # It will automatically find all other settings (data, imgsz, etc.)
         # and continue from epoch 40 all the way to 100.
-        results = model.train(resume=True)
+        results = model.train(
+            resume=True, trainer=CachedDetectionTrainer, device=select_device()
+        )
 
         print("Training resumed and completed!")
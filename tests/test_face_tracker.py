@@ -0,0 +1,58 @@
+import numpy as np
+
+from FaceTracker import FaceTracker, iou
+
+
+def textured(shape=(240, 320), seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+
+
+def test_iou():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (20, 20, 10, 10)) == 0.0
+    assert iou((0, 0, 10, 10), (5, 0, 10, 10)) == 50 / 150
+
+
+def test_overlapping_detection_keeps_the_track_id():
+    gray = textured()
+    tracker = FaceTracker()
+    tracker.update(gray, [(50, 50, 40, 40)])
+    tracker.update(gray, [(54, 52, 40, 40), (200, 100, 40, 40)])
+
+    ids = {track.box: track.id for track in tracker.tracks}
+    assert ids[(54, 52, 40, 40)] == 0
+    assert ids[(200, 100, 40, 40)] == 1
+
+
+def test_track_is_dropped_after_max_misses():
+    gray = textured()
+    tracker = FaceTracker(max_misses=2)
+    tracker.update(gray, [(50, 50, 40, 40)])
+    for _ in range(2):
+        tracker.update(gray, [])
+        assert len(tracker.tracks) == 1
+    tracker.update(gray, [])
+    assert tracker.tracks == []
+
+
+def test_detection_is_requested_every_detect_every_frames():
+    gray = textured()
+    tracker = FaceTracker(detect_every=3)
+    assert tracker.needs_detection()
+    tracker.update(gray, [(50, 50, 40, 40)])
+    for _ in range(2):
+        assert not tracker.needs_detection()
+        tracker.track(gray)
+    assert not tracker.needs_detection()
+    tracker.track(gray)
+    assert tracker.needs_detection()
+
+
+def test_template_follows_a_static_face():
+    gray = textured()
+    tracker = FaceTracker()
+    tracker.update(gray, [(100, 80, 48, 48)])
+    tracker.track(gray)
+    track = tracker.tracks[0]
+    assert track.score > 0.9
+    assert abs(track.box[0] - 100) <= 2 and abs(track.box[1] - 80) <= 2
@@ -0,0 +1,44 @@
+import numpy as np
+
+from History import EmotionHistory, Tier
+
+
+def ones(n=2):
+    return np.ones(n, dtype=np.int64), np.full(n, 10, dtype=np.int64)
+
+
+def test_tier_closes_a_bucket_when_the_next_one_starts():
+    tier = Tier(60, 4, 2)
+    for second in range(0, 60, 10):
+        assert tier.add(second, *ones()) is None
+    closed = tier.add(60, *ones())
+
+    start, counts, sums = closed
+    assert start == 0
+    assert counts.tolist() == [6, 6]
+    assert sums.tolist() == [60, 60]
+    assert tier.open_time == 60
+
+
+def test_full_tier_overwrites_its_oldest_bucket():
+    tier = Tier(1, 2, 2)
+    for second in range(4):
+        tier.add(second, *ones())
+    # Seconds 1 and 2 in the ring, 3 still open, 0 overwritten
+    assert tier.oldest() == 1
+    counts, _ = tier.totals(0, 10)
+    assert counts.tolist() == [3, 3]
+
+
+def test_history_rolls_seconds_up_into_minutes():
+    history = EmotionHistory(names=["a", "b"])
+    start = 1_000_020
+    for second in range(start, start + 120):
+        history.updateArrays([0], [0.5], timestamp=second)
+
+    minutes = history.tiers[1]
+    closed = minutes.times[minutes.times >= 0]
+    assert len(closed) == 1
+    counts, _ = history.totals(start, start + 120)
+    assert counts.tolist() == [120, 0]
+    assert history.counts(start, start + 120)["a"] == [120, 0.5]
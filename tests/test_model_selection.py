@@ -0,0 +1,50 @@
+import pytest
+
+from ModelSelection import pareto_front, select_model
+
+
+def entry(name, ms, value, task="detect", metric="metrics/mAP50-95(B)"):
+    return {
+        "weights": name,
+        "task": task,
+        "accuracy": {"metric": metric, "value": value},
+        "latency": {"1": {"p95_ms": ms}},
+    }
+
+
+FAST = entry("fast", 10, 0.5)
+DOMINATED = entry("dominated", 20, 0.4)
+ACCURATE = entry("accurate", 30, 0.7)
+REPORT = {"entries": [ACCURATE, DOMINATED, FAST]}
+
+
+def test_front_drops_dominated_entries_fastest_first():
+    assert [e["weights"] for e in pareto_front(REPORT["entries"])] == ["fast", "accurate"]
+
+
+def test_equal_accuracy_keeps_only_the_faster_one():
+    slower = entry("slower", 15, 0.5)
+    assert [e["weights"] for e in pareto_front([slower, FAST])] == ["fast"]
+
+
+def test_select_most_accurate_within_budget():
+    assert select_model(REPORT, 25)["weights"] == "fast"
+    assert select_model(REPORT, 30)["weights"] == "accurate"
+
+
+def test_select_fastest_when_nothing_fits():
+    assert select_model(REPORT, 5)["weights"] == "fast"
+
+
+def test_select_stays_within_the_task():
+    classify = entry("cls", 5, 0.9, task="classify", metric="metrics/accuracy_top1")
+    report = {"entries": REPORT["entries"] + [classify]}
+    assert select_model(report, 100, "detect")["weights"] == "accurate"
+    assert select_model(report, 100, "classify")["weights"] == "cls"
+    assert select_model({"entries": [FAST]}, 100, "classify") is None
+
+
+def test_mixed_metrics_are_not_ranked_together():
+    classify = entry("cls", 5, 0.9, task="classify", metric="metrics/accuracy_top1")
+    with pytest.raises(ValueError):
+        pareto_front([FAST, classify])
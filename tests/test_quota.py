@@ -0,0 +1,35 @@
+import numpy as np
+
+from LabelManifest import balanced_quota, proportional_quota
+
+
+def test_proportional_quota_sums_to_total_and_keeps_shares():
+    available = np.array([500, 300, 150, 50])
+    quota = proportional_quota(available, 100)
+    assert quota.sum() == 100
+    assert quota.tolist() == [50, 30, 15, 5]
+
+
+def test_proportional_quota_rounds_by_largest_remainder():
+    quota = proportional_quota(np.array([1, 1, 1]), 2)
+    assert quota.sum() == 2
+    assert (quota <= 1).all()
+
+
+def test_balanced_quota_splits_equally():
+    quota = balanced_quota(np.array([100, 100, 100, 100]), 40)
+    assert quota.tolist() == [10, 10, 10, 10]
+
+
+def test_balanced_quota_gives_what_small_strata_lack_to_the_rest():
+    available = np.array([2, 100, 100])
+    quota = balanced_quota(available, 30)
+    assert quota.sum() == 30
+    assert quota[0] == 2
+    assert abs(quota[1] - quota[2]) <= 1
+
+
+def test_quotas_never_exceed_what_is_available():
+    available = np.array([3, 5, 1])
+    assert balanced_quota(available, 100).tolist() == available.tolist()
+    assert (proportional_quota(available, 9) <= available).all()
@@ -0,0 +1,57 @@
+import numpy as np
+
+from Plot import CONF_SCALE, RollingWindow
+
+
+def frame(counts, confs):
+    counts = np.asarray(counts, dtype=np.int64)
+    return counts, (np.asarray(confs, dtype=np.float64) * CONF_SCALE * counts).astype(np.int64)
+
+
+def test_frame_window_evicts_exactly_the_oldest_frame():
+    window = RollingWindow(2, frames=3)
+    frames = [
+        frame([1, 0], [0.5, 0]),
+        frame([0, 2], [0, 0.25]),
+        frame([3, 1], [0.1, 0.9]),
+        frame([1, 1], [0.3, 0.3]),
+    ]
+    for i, (counts, sums) in enumerate(frames):
+        window.add(counts, sums, timestamp=i)
+
+    kept = frames[1:]
+    assert window.counts.tolist() == sum(counts for counts, _ in kept).tolist()
+    assert window.sums_.tolist() == sum(sums for _, sums in kept).tolist()
+
+
+def test_many_evictions_leave_no_drift():
+    rng = np.random.default_rng(0)
+    window = RollingWindow(3, frames=5)
+    history = []
+    for i in range(1000):
+        counts = rng.integers(0, 3, 3)
+        sums = (rng.random(3) * CONF_SCALE).astype(np.int64) * counts
+        history.append((counts, sums))
+        window.add(counts, sums, timestamp=i)
+
+    assert window.counts.tolist() == sum(c for c, _ in history[-5:]).tolist()
+    assert window.sums_.tolist() == sum(s for _, s in history[-5:]).tolist()
+
+
+def test_time_window_drops_buckets_older_than_the_window():
+    window = RollingWindow(1, seconds=1.0, resolution=0.1)
+    window.add(*frame([1], [0.5]), timestamp=10.0)
+    window.add(*frame([2], [0.5]), timestamp=10.55)
+    assert window.counts.tolist() == [3]
+
+    # 10.0 is exactly one window back, its bucket is reused
+    window.add(*frame([4], [0.5]), timestamp=11.0)
+    assert window.counts.tolist() == [6]
+
+
+def test_time_window_gap_longer_than_the_window_clears_it():
+    window = RollingWindow(1, seconds=1.0, resolution=0.1)
+    window.add(*frame([5], [0.5]), timestamp=0.0)
+    window.add(*frame([1], [0.8]), timestamp=60.0)
+    assert window.counts.tolist() == [1]
+    assert np.allclose(window.means(), [0.8])
@@ -0,0 +1,44 @@
+import polars as pl
+import pytest
+
+from Sidecar import SCHEMA, Sidecar
+
+
+@pytest.fixture
+def sidecar(tmp_path):
+    # Four frames: one Happy face, none, a Happy and a Sad one, one Sad face
+    rows = {
+        "frame": [0, 1, 2, 3],
+        "timestamp_ms": [0.0, 40.0, 80.0, 120.0],
+        "track_ids": [[0], [], [0, 1], [1]],
+        "boxes": [
+            [[0, 0, 10, 10]],
+            [],
+            [[0, 0, 10, 10], [20, 20, 30, 30]],
+            [[20, 20, 30, 30]],
+        ],
+        "classes": [[0], [], [0, 1], [1]],
+        "confidences": [[0.5], [], [0.7, 0.4], [0.2]],
+    }
+    path = tmp_path / "video.mp4.emotions.parquet"
+    pl.DataFrame(rows, schema=SCHEMA).write_parquet(path)
+    info = {"fps": 25.0, "frame_size": [640, 480], "frames": 4, "names": ["Happy", "Sad"]}
+    return Sidecar(str(path), info)
+
+
+def test_counts_cover_the_half_open_interval(sidecar):
+    assert sidecar.counts(0, 80) == {"Happy": [1, 0.5], "Sad": [0, 0.0]}
+    counts = sidecar.counts(40, 121)
+    assert counts["Happy"] == [1, pytest.approx(0.7)]
+    assert counts["Sad"] == [2, pytest.approx(0.3)]
+
+
+def test_counts_of_the_whole_video(sidecar):
+    counts = sidecar.counts(0, sidecar.duration_ms() + 1)
+    assert counts["Happy"] == [2, pytest.approx(0.6)]
+    assert counts["Sad"] == [2, pytest.approx(0.3)]
+
+
+def test_frame_at_maps_times_to_the_frame_shown(sidecar):
+    assert [sidecar.frame_at(t) for t in (-5, 0, 39, 40, 500)] == [0, 0, 0, 1, 3]
+    assert len(sidecar.detections(2)) == 2